@@ -1,3 +1,5 @@
+import os
+
 import bpy
 from bpy.props import StringProperty
 from bpy_extras.io_utils import ImportHelper, ExportHelper
@@ -18,6 +20,9 @@ bl_info = {
     "category": "Import-Export"
 }
 
+# Binary glTF container header
+GLB_MAGIC = b"glTF"
+
 class ImportVRM(bpy.types.Operator, ImportHelper):
     bl_idname = "import_scene.vrm"
     bl_label = "Import VRM"
@@ -26,30 +31,38 @@ class ImportVRM(bpy.types.Operator, ImportHelper):
 
     def execute(self, context):
         logger.info("ImportVRM.execute called")
+        temp_filepath = self.filepath + ".temp.glb"
         try:
-            # Import as GLB first
-            temp_filepath = self.filepath + ".temp.glb"
-            import shutil
-            shutil.copy2(self.filepath, temp_filepath)
-            
+            # The glTF importer detects GLB by its magic, so binary VRM files are read in place;
+            # anything else is aliased as a .glb instead of being copied byte-for-byte
+            with open(self.filepath, "rb") as f:
+                is_glb = f.read(len(GLB_MAGIC)) == GLB_MAGIC
+
+            import_path = self.filepath
+            if not is_glb:
+                try:
+                    os.link(self.filepath, temp_filepath)
+                except OSError:
+                    os.symlink(self.filepath, temp_filepath)
+                import_path = temp_filepath
+
             # Import using glTF importer
             bpy.ops.import_scene.gltf(
-                filepath=temp_filepath,
+                filepath=import_path,
                 import_pack_images=True,
                 merge_vertices=True
             )
-            
-            # Clean up temp file
-            import os
-            if os.path.exists(temp_filepath):
-                os.remove(temp_filepath)
-                
+
             logger.info("VRM import finished")
             return {"FINISHED"}
         except Exception as e:
             logger.error("Error importing VRM: %s", e)
             self.report({"ERROR"}, f"Error importing VRM: {str(e)}")
             return {"CANCELLED"}
+        finally:
+            # Clean up the alias (the original VRM is left untouched)
+            if os.path.lexists(temp_filepath):
+                os.remove(temp_filepath)
 
 class ExportVRM(bpy.types.Operator, ExportHelper):
     bl_idname = "export_scene.vrm"
@@ -72,6 +85,7 @@ class ExportVRM(bpy.types.Operator, ExportHelper):
                 export_colors=True,
                 export_skins=True,
                 export_morph=True,
+                export_try_sparse_sk=True,
                 export_lights=False,
                 export_cameras=False,
                 export_apply=True,
@@ -79,9 +93,9 @@ class ExportVRM(bpy.types.Operator, ExportHelper):
                 export_current_frame=True
             )
             
-            # Convert GLB to VRM
-            import shutil
-            shutil.move(temp_filepath, self.filepath)
+            # Convert GLB to VRM by renaming (atomic on the same filesystem). Not run through gltfpack:
+            # it drops the VRM extension, merges nodes the humanoid bones point at, and makes meshopt required
+            os.replace(temp_filepath, self.filepath)
             logger.info("VRM export finished")
             return {"FINISHED"}
         except Exception as e:
@@ -1,19 +1,55 @@
-import gc
 import os
 
 import bpy
-from typing import Optional, Tuple
+from typing import Any, Callable, Dict, Optional, Tuple
 
+from app.config import get_settings
+from app.utils.gltfpack import QUANTIZE_ARGS, pack_glb
 from app.utils.logger import AppLogger
 from app.blender.setup import setup_vrm_addon
 
 logger = AppLogger.get_logger(__name__)
 
+# フォーマットごとの (オペレーター, 追加引数)。オペレーターはimport時に1回だけ解決する。
+# bpy.ops wrappers dispatch by idname at call time, so binding before the VRM addon registers is safe.
+_IMPORTERS: Dict[str, Tuple[Callable[..., object], Dict[str, Any]]] = {
+    "fbx": (
+        bpy.ops.import_scene.fbx,
+        {
+            "use_custom_props": False,
+            "use_image_search": False,
+            "use_anim": False,
+            "global_scale": 1.0,
+            "use_manual_orientation": True,
+        },
+    ),
+    "obj": (bpy.ops.import_scene.obj, {}),
+    "gltf": (bpy.ops.import_scene.gltf, {}),
+    "glb": (bpy.ops.import_scene.gltf, {}),
+    "vrm": (bpy.ops.import_scene.vrm, {}),
+    "bvh": (bpy.ops.import_anim.bvh, {}),
+}
+
+# AUTO writes PNG/JPEG sources back unchanged instead of re-encoding every texture.
+# Animations are kept: motion data is what this service converts.
+_GLTF_EXPORT_OPTIONS: Dict[str, Any] = {"export_try_sparse_sk": True, "export_image_format": "AUTO"}
+
+_EXPORTERS: Dict[str, Tuple[Callable[..., object], Dict[str, Any]]] = {
+    "fbx": (bpy.ops.export_scene.fbx, {"use_selection": False}),
+    "obj": (bpy.ops.export_scene.obj, {"use_selection": False}),
+    "gltf": (bpy.ops.export_scene.gltf, {"export_format": "GLTF_SEPARATE", **_GLTF_EXPORT_OPTIONS}),
+    "glb": (bpy.ops.export_scene.gltf, {"export_format": "GLB", **_GLTF_EXPORT_OPTIONS}),
+    "vrm": (bpy.ops.export_scene.vrm, {}),
+    "bvh": (bpy.ops.export_anim.bvh, {}),
+}
+
 
 def import_file(input_path: str, file_format: str) -> Tuple[bool, Optional[str]]:
     """
     指定された形式に応じてBlenderへインポートし、(成功可否, メッセージ)を返す。
 
+    シーンの初期化は呼び出し側（`convert_file` の `clear_scene`）で済んでいる前提とする。
+
     Args:
         input_path (str): インポート対象ファイルのパス。
         file_format (str): インポートするファイル形式。
@@ -23,37 +59,20 @@ def import_file(input_path: str, file_format: str) -> Tuple[bool, Optional[str]]
     Returns:
         Tuple[bool, Optional[str]]: (処理が成功したかどうか, エラーメッセージまたはNone)。
     """
+    entry = _IMPORTERS.get(file_format)
+    if entry is None:
+        return False, f"Unsupported input format: {file_format}"
+
     try:
         logger.info(f"Importing {file_format} file: {input_path}")
 
-        bpy.ops.wm.read_factory_settings(use_empty=True)
-        for obj in bpy.data.objects:
-            bpy.data.objects.remove(obj, do_unlink=True)
-
-        gc.collect()
-
-        if file_format == "fbx":
-            bpy.ops.import_scene.fbx(
-                filepath=input_path,
-                use_custom_props=False,
-                use_image_search=False,
-                use_anim=False,
-                global_scale=1.0,
-                use_manual_orientation=True,
-            )
-        elif file_format == "obj":
-            bpy.ops.import_scene.obj(filepath=input_path)
-        elif file_format in ("gltf", "glb"):
-            bpy.ops.import_scene.gltf(filepath=input_path)
-        elif file_format == "vrm":
+        if file_format == "vrm":
             success, error = setup_vrm_addon()
             if not success:
                 return False, error
-            bpy.ops.import_scene.vrm(filepath=input_path)
-        elif file_format == "bvh":
-            bpy.ops.import_anim.bvh(filepath=input_path)
-        else:
-            return False, f"Unsupported input format: {file_format}"
+
+        operator, options = entry
+        operator(filepath=input_path, **options)
 
         if len(bpy.data.objects) == 0:
             logger.error("Import resulted in no objects")
@@ -86,33 +105,32 @@ def export_file(output_path: str, file_format: str) -> Tuple[bool, Optional[str]
         Tuple[bool, Optional[str]]: (成功可否, メッセージ) のタプル。
             成功時は (True, None)、失敗時は (False, エラーメッセージ) を返す。
     """
+    entry = _EXPORTERS.get(file_format)
+    if entry is None:
+        return False, f"Unsupported output format: {file_format}"
+
     try:
         logger.info(f"Exporting to {file_format}: {output_path}")
 
-        if file_format == "fbx":
-            bpy.ops.export_scene.fbx(filepath=output_path, use_selection=False)
-        elif file_format == "obj":
-            bpy.ops.export_scene.obj(filepath=output_path, use_selection=False)
-        elif file_format == "gltf":
-            bpy.ops.export_scene.gltf(filepath=output_path, export_format="GLTF_SEPARATE")
-        elif file_format == "glb":
-            bpy.ops.export_scene.gltf(filepath=output_path, export_format="GLB")
-        elif file_format == "vrm":
+        if file_format == "vrm":
             success, error = setup_vrm_addon()
             if not success:
                 return False, error
-            bpy.ops.export_scene.vrm(filepath=output_path)
-        elif file_format == "bvh":
-            if not bpy.data.actions:
-                return False, "No animation data found to export to BVH."
-            bpy.ops.export_anim.bvh(filepath=output_path)
-        else:
-            return False, f"Unsupported output format: {file_format}"
+        elif file_format == "bvh" and not bpy.data.actions:
+            return False, "No animation data found to export to BVH."
+
+        operator, options = entry
+        operator(filepath=output_path, **options)
 
         if not os.path.exists(output_path):
             logger.error("Export file was not created")
             return False, "Export file was not created"
 
+        # Quantize vertex attributes in place (KHR_mesh_quantization) without resampling or dropping animation.
+        # VRM is never packed: gltfpack would strip the VRM extension
+        if file_format == "glb" and get_settings().gltf_quantize:
+            pack_glb(output_path, output_path, QUANTIZE_ARGS)
+
         logger.info(f"Successfully exported to {output_path}")
         return True, None
     except Exception as exc:
@@ -0,0 +1,164 @@
+"""常駐ヘッドレスBlenderワーカーのプール。
+
+`bpy` はプロセスごとのシングルトンのため、変換を並列化するにはBlenderプロセスを複数起動する。
+各ワーカーは起動時に1回だけ初期化され、以降は JSON Lines でジョブを受け取り続ける。
+"""
+import json
+import os
+import queue
+import select
+import subprocess
+import time
+from typing import List, Optional, Sequence, Tuple
+
+from app.utils.logger import AppLogger
+
+logger = AppLogger.get_logger(__name__)
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "worker.py")
+WORKER_COMMAND = ("blender", "--background", "--factory-startup", "--python", WORKER_SCRIPT)
+# Names the inherited pipe fd a worker writes its replies to
+REPLY_FD_ENV = "CONVERSION_WORKER_REPLY_FD"
+# Bytes read from the reply pipe per os.read
+_REPLY_READ_SIZE = 64 * 1024
+
+
+class _BlenderWorker:
+    """1つのBlenderサブプロセスと、ジョブのやり取りを管理する。
+
+    ジョブは標準入力へ送り、結果は専用のパイプ（fd を環境変数 `REPLY_FD_ENV` で渡す）から受け取る。
+    Blender はスクリプト実行前に起動バナーを標準出力へ書くため、標準出力は応答に使わない。
+    """
+
+    def __init__(self, command: Sequence[str]):
+        self._reply_fd, write_fd = os.pipe()
+        try:
+            self.process = subprocess.Popen(
+                list(command),
+                stdin=subprocess.PIPE,
+                # The banner and anything Blender prints join this process's stderr, as logs do
+                stdout=2,
+                text=True,
+                bufsize=1,
+                pass_fds=(write_fd,),
+                env={**os.environ, REPLY_FD_ENV: str(write_fd)},
+            )
+        except BaseException:
+            os.close(self._reply_fd)
+            raise
+        finally:
+            # Only the child keeps the write end, so its exit shows up here as EOF
+            os.close(write_fd)
+        # Bytes read past the last complete reply line
+        self._pending = b""
+
+    def _read_line(self, deadline: float) -> bytes:
+        """応答パイプから1行を読む。deadline（monotonic 時刻）までに届かなければ TimeoutError。"""
+        # Read the raw fd: select() cannot see data already sitting in a buffered reader
+        while b"\n" not in self._pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError
+            ready, _, _ = select.select([self._reply_fd], [], [], remaining)
+            if not ready:
+                raise TimeoutError
+            chunk = os.read(self._reply_fd, _REPLY_READ_SIZE)
+            if not chunk:
+                raise EOFError(f"Worker exited with code {self.process.poll()}")
+            self._pending += chunk
+        line, _, self._pending = self._pending.partition(b"\n")
+        return line
+
+    def run(self, job: dict, timeout_seconds: float) -> Tuple[bool, str]:
+        """ジョブを送信し、タイムアウト秒以内に返ってきた結果を (成功可否, メッセージ) で返す。"""
+        deadline = time.monotonic() + timeout_seconds
+        self.process.stdin.write(json.dumps(job) + "\n")
+        self.process.stdin.flush()
+
+        result = json.loads(self._read_line(deadline))
+        return result["success"], result["message"]
+
+    def kill(self) -> None:
+        """ワーカープロセスを強制終了する。"""
+        self.process.kill()
+        self.process.wait()
+        os.close(self._reply_fd)
+
+    def close(self) -> None:
+        """標準入力を閉じてワーカーに終了を通知する。"""
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        os.close(self._reply_fd)
+
+
+class ConversionPool:
+    """変換ジョブを空いている常駐Blenderワーカーへ振り分けるプール。
+
+    ワーカーがタイムアウトまたは異常終了した場合は、そのワーカーを破棄して新しく起動し直す。
+    """
+
+    def __init__(self, size: int, timeout_seconds: int, command: Sequence[str] = WORKER_COMMAND):
+        self._command = tuple(command)
+        self._timeout_seconds = timeout_seconds
+        self._workers: List[_BlenderWorker] = []
+        self._idle: queue.Queue[_BlenderWorker] = queue.Queue()
+        for _ in range(size):
+            self._idle.put(self._spawn())
+        logger.info(f"Started {size} conversion workers")
+
+    def _spawn(self) -> _BlenderWorker:
+        worker = _BlenderWorker(self._command)
+        self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker: _BlenderWorker) -> _BlenderWorker:
+        worker.kill()
+        self._workers.remove(worker)
+        return self._spawn()
+
+    def convert(
+        self, input_path: str, output_path: str, input_format: str, output_format: str
+    ) -> Tuple[bool, str]:
+        """空いているワーカーで変換を実行し、(成功可否, メッセージ)を返す。"""
+        job = {
+            "input_path": input_path,
+            "output_path": output_path,
+            "input_format": input_format,
+            "output_format": output_format,
+        }
+        # Waiting for a free worker counts against the timeout, like waiting for the in-process lock
+        deadline = time.monotonic() + self._timeout_seconds
+        try:
+            worker = self._idle.get(timeout=self._timeout_seconds)
+        except queue.Empty:
+            logger.error(f"No conversion worker became free within {self._timeout_seconds}s")
+            return False, "Conversion timed out"
+        try:
+            return worker.run(job, deadline - time.monotonic())
+        except TimeoutError:
+            logger.error(f"Conversion worker timed out after {self._timeout_seconds}s, restarting it")
+            worker = self._replace(worker)
+            return False, "Conversion timed out"
+        except (OSError, EOFError, ValueError, KeyError) as exc:
+            logger.error(f"Conversion worker failed, restarting it: {exc}")
+            worker = self._replace(worker)
+            return False, f"Conversion worker error: {exc}"
+        finally:
+            self._idle.put(worker)
+
+    def close(self) -> None:
+        """全ワーカーを終了する。"""
+        for worker in self._workers:
+            worker.close()
+        self._workers.clear()
+
+
+def create_conversion_pool(size: int, timeout_seconds: int) -> Optional[ConversionPool]:
+    """ワーカー数が1以上ならプールを起動して返す。0以下ならNone（プロセス内で変換する）。"""
+    if size <= 0:
+        return None
+    return ConversionPool(size, timeout_seconds)
@@ -1,28 +1,56 @@
-import gc
+import importlib
+import os
 import sys
-import traceback
-from typing import Optional, Tuple
+from typing import Optional, Set, Tuple
 
 import bpy
 
+from app.config import get_settings
 from app.utils.logger import AppLogger
 
+try:
+    import io_scene_vrm
+except ImportError:
+    # Resolved by setup_vrm_addon once the addon paths are on sys.path.
+    io_scene_vrm = None
+
 logger = AppLogger.get_logger(__name__)
 
 
+# VRMアドオンがこのプロセスで登録済みかどうか
+_VRM_READY = False
+
+# 有効化済みのアドオン名（初回の setup_addons でユーザー設定から取り込む）
+_ENABLED_ADDONS: Set[str] = set()
+
+# 変換に必須のアドオン
+_REQUIRED_ADDONS = ("io_scene_fbx", "io_scene_gltf2")
+
+
+def _vrm_addon_paths() -> Tuple[str, str]:
+    """VRMアドオンの探索パスを返す。`BLENDER_SYSTEM_SCRIPTS` はキャッシュ済み設定から1回だけ読み込む。"""
+    addons_dir = os.path.join(get_settings().blender_system_scripts, "addons")
+    return addons_dir, os.path.join(addons_dir, "modules")
+
+
+def _batch_remove(collections) -> int:
+    """複数のデータコレクションに含まれるIDを1回の `bpy.data.batch_remove` でまとめて削除し、件数を返す。"""
+    ids = [item for collection in collections for item in collection]
+    if ids:
+        bpy.data.batch_remove(ids=ids)
+    return len(ids)
+
+
 def handle_blender_error(error_type, value, tb):
     """Blender実行中の未処理例外を捕捉し、ログ出力とシーン初期化を試みたうえで再送出する。
 
     Args:
         error_type: 発生した例外クラス（`BaseException` を継承した型）。`sys.excepthook` の第1引数に相当する。
         value: 発生した例外インスタンス。`sys.excepthook` の第2引数に相当する。
-        tb: 例外発生時のトレースバックオブジェクト。`sys.excepthook` の第3引数に相当し、`traceback.format_tb()` でフォーマット可能なオブジェクト。
+        tb: 例外発生時のトレースバックオブジェクト。`sys.excepthook` の第3引数に相当し、ログレコードに添付される。
     """
-    error_msg = f"Blender error: {error_type.__name__}: {value}"
-    logger.error(error_msg)
-    logger.error("Traceback:")
-    for line in traceback.format_tb(tb):
-        logger.error(line.strip())
+    # One record with the traceback attached, rather than one record per frame
+    logger.error(f"Blender error: {error_type.__name__}: {value}", exc_info=(error_type, value, tb))
 
     try:
         bpy.ops.wm.read_factory_settings(use_empty=True)
@@ -34,29 +62,28 @@ def handle_blender_error(error_type, value, tb):
 
 
 def clear_scene() -> Tuple[bool, Optional[str]]:
-    """Blenderシーンを初期化し、オブジェクト/データブロックを削除してGCを実行する。(成功可否, メッセージ)を返す。"""
+    """Blenderシーンを初期化し、オブジェクト/データブロックを削除する。(成功可否, メッセージ)を返す。"""
     try:
         bpy.ops.wm.read_factory_settings(use_empty=True)
 
-        scene = bpy.context.scene
-        scene.render.engine = "BLENDER_WORKBENCH"
-        scene.render.film_transparent = True
+        render = bpy.context.scene.render
+        render.engine = "BLENDER_WORKBENCH"
+        render.film_transparent = True
 
         bpy.ops.object.select_all(action="SELECT")
         bpy.ops.object.delete()
 
-        for collection in [
-            bpy.data.meshes,
-            bpy.data.materials,
-            bpy.data.textures,
-            bpy.data.images,
-            bpy.data.actions,
-            bpy.data.armatures,
-        ]:
-            for item in collection:
-                collection.remove(item)
-
-        gc.collect()
+        _batch_remove(
+            [
+                bpy.data.meshes,
+                bpy.data.materials,
+                bpy.data.textures,
+                bpy.data.images,
+                bpy.data.actions,
+                bpy.data.armatures,
+            ]
+        )
+
         return True, None
     except Exception as exc:
         logger.error(f"Error clearing scene: {exc}")
@@ -64,13 +91,16 @@ def clear_scene() -> Tuple[bool, Optional[str]]:
 
 
 def setup_vrm_addon() -> Tuple[bool, Optional[str]]:
-    """VRMアドオンのパスを追加し、GLTFを先に有効化してVRMを登録する。(成功可否, メッセージ)を返す。"""
+    """VRMアドオンのパスを追加し、GLTFを先に有効化してVRMを登録する。(成功可否, メッセージ)を返す。
+
+    登録はプロセス内で1回だけ行い、以降はオペレーターが残っている限り即座に成功を返す。
+    """
+    global _VRM_READY, io_scene_vrm
+    if _VRM_READY and hasattr(bpy.ops.import_scene, "vrm"):
+        return True, None
+
     try:
-        addon_paths = [
-            "/usr/local/blender/4.3/scripts/addons",
-            "/usr/local/blender/4.3/scripts/addons/modules",
-        ]
-        for path in addon_paths:
+        for path in _vrm_addon_paths():
             if path not in sys.path:
                 sys.path.append(path)
 
@@ -78,16 +108,16 @@ def setup_vrm_addon() -> Tuple[bool, Optional[str]]:
             logger.info("Enabling GLTF addon...")
             bpy.ops.preferences.addon_enable(module="io_scene_gltf2")
 
-        import importlib
-        import io_scene_vrm
+        if io_scene_vrm is None:
+            io_scene_vrm = importlib.import_module("io_scene_vrm")
 
-        importlib.reload(io_scene_vrm)
         io_scene_vrm.register()
 
         if not hasattr(bpy.ops.import_scene, "vrm"):
             logger.error("VRM addon registration failed")
             return False, "VRM addon registration failed"
 
+        _VRM_READY = True
         logger.info("VRM addon setup completed successfully")
         return True, None
     except Exception as exc:
@@ -97,18 +127,26 @@ def setup_vrm_addon() -> Tuple[bool, Optional[str]]:
 
 def setup_addons() -> Tuple[bool, Optional[str]]:
     """必須アドオン（FBX, glTF）が有効か確認し、足りなければ有効化する。(成功可否, メッセージ)を返す。"""
+    # Addons stay enabled for the process lifetime, so per-request calls return here
+    if _ENABLED_ADDONS.issuperset(_REQUIRED_ADDONS):
+        return True, None
+
     try:
         logger.info("Setting up required addons...")
-        required_addons = ["io_scene_fbx", "io_scene_gltf2"]
 
-        for addon in required_addons:
-            if not hasattr(bpy.ops.import_scene, addon.split("_")[-1]):
-                try:
-                    bpy.ops.preferences.addon_enable(module=addon)
-                    logger.info(f"Enabled addon: {addon}")
-                except Exception as exc:
-                    logger.error(f"Failed to enable {addon}: {exc}")
-                    return False, f"Failed to enable {addon}"
+        if not _ENABLED_ADDONS:
+            _ENABLED_ADDONS.update(bpy.context.preferences.addons.keys())
+
+        for addon in _REQUIRED_ADDONS:
+            if addon in _ENABLED_ADDONS:
+                continue
+            try:
+                bpy.ops.preferences.addon_enable(module=addon)
+                _ENABLED_ADDONS.add(addon)
+                logger.info(f"Enabled addon: {addon}")
+            except Exception as exc:
+                logger.error(f"Failed to enable {addon}: {exc}")
+                return False, f"Failed to enable {addon}"
 
         return True, None
     except Exception as exc:
@@ -117,7 +155,10 @@ def setup_addons() -> Tuple[bool, Optional[str]]:
 
 
 def initialize_blender() -> Tuple[bool, Optional[str]]:
-    """ヘッドレス変換向けにBlenderを初期化する。エラーフック設定、アドオン有効化、シーン/データクリア、レンダー設定調整、VRM登録解除を行い、(成功可否, メッセージ)を返す。"""
+    """ヘッドレス変換向けにBlenderを初期化する。
+
+    エラーフック設定、アドオン有効化、シーン/データクリア、レンダー設定調整を行い、(成功可否, メッセージ)を返す。
+    """
     try:
         sys.excepthook = handle_blender_error
 
@@ -130,27 +171,21 @@ def initialize_blender() -> Tuple[bool, Optional[str]]:
         bpy.ops.object.select_all(action="SELECT")
         bpy.ops.object.delete()
 
-        scene = bpy.context.scene
-        scene.render.engine = "BLENDER_WORKBENCH"
-        scene.render.film_transparent = True
-        scene.render.use_persistent_data = False
-
-        for screen in bpy.data.screens:
-            for area in screen.areas:
-                if area.type == "VIEW_3D":
-                    for space in area.spaces:
-                        if space.type == "VIEW_3D":
-                            space.shading.type = "SOLID"
-                            space.shading.use_scene_lights = False
-                            space.shading.use_scene_world = False
-
-        try:
-            import io_scene_vrm
-
-            io_scene_vrm.unregister()
-        except Exception:
-            # If VRM was not registered, continue without failing init.
-            pass
+        render = bpy.context.scene.render
+        render.engine = "BLENDER_WORKBENCH"
+        render.film_transparent = True
+        render.use_persistent_data = False
+
+        # Headless (--background) sessions have no 3D viewports to adjust
+        if not bpy.app.background:
+            for screen in bpy.data.screens:
+                for area in screen.areas:
+                    if area.type == "VIEW_3D":
+                        for space in area.spaces:
+                            if space.type == "VIEW_3D":
+                                space.shading.type = "SOLID"
+                                space.shading.use_scene_lights = False
+                                space.shading.use_scene_world = False
 
         data_to_clear = [
             (bpy.data.objects, "objects"),
@@ -166,15 +201,19 @@ def initialize_blender() -> Tuple[bool, Optional[str]]:
             (bpy.data.node_groups, "node groups"),
         ]
 
+        collections = []
         for data_collection, name in data_to_clear:
             try:
-                for item in data_collection:
-                    data_collection.remove(item, do_unlink=True)
-                logger.info(f"Cleared {name}")
+                collections.append(list(data_collection))
             except Exception as exc:
-                logger.warning(f"Error clearing {name}: {exc}")
+                logger.warning(f"Error collecting {name}: {exc}")
+
+        try:
+            removed = _batch_remove(collections)
+            logger.info(f"Cleared {removed} datablocks")
+        except Exception as exc:
+            logger.warning(f"Error clearing datablocks: {exc}")
 
-        gc.collect()
         return True, None
     except Exception as exc:
         logger.error(f"Error initializing Blender: {exc}")
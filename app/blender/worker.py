@@ -0,0 +1,54 @@
+"""常駐するヘッドレスBlenderワーカー。
+
+`blender --background --factory-startup --python app/blender/worker.py` として起動し、
+標準入力から1行1件のJSONジョブを受け取り、結果を1行のJSONで応答用パイプ
+（fd は環境変数 `CONVERSION_WORKER_REPLY_FD`）へ返す。
+"""
+import gc
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.blender.pool import REPLY_FD_ENV  # noqa: E402
+from app.blender.setup import initialize_blender  # noqa: E402
+from app.services.conversion_service import convert_file  # noqa: E402
+from app.utils.logger import AppLogger  # noqa: E402
+
+logger = AppLogger.get_logger(__name__)
+
+# Replies get their own pipe: Blender writes its banner to stdout before this script even starts
+_protocol = os.fdopen(int(os.environ[REPLY_FD_ENV]), "w", buffering=1)
+
+
+def main() -> int:
+    """Blenderを1回だけ初期化し、標準入力が閉じられるまでジョブを処理する。"""
+    success, error = initialize_blender()
+    if not success:
+        logger.error(f"Worker failed to initialize Blender: {error}")
+        return 1
+
+    logger.info(f"Conversion worker ready (pid={os.getpid()})")
+    for line in sys.stdin:
+        job = json.loads(line)
+        # Import/export allocate many short-lived Python objects; skip gen2 sweeps while they run.
+        # Jobs run one at a time on this thread, so no other work loses the collector meanwhile
+        gc.disable()
+        try:
+            success, message = convert_file(
+                job["input_path"],
+                job["output_path"],
+                job["input_format"],
+                job["output_format"],
+            )
+        finally:
+            gc.enable()
+            gc.collect(generation=0)
+        _protocol.write(json.dumps({"success": success, "message": message}) + "\n")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,3 +3,6 @@
 通常は :mod:`app.config.settings` と ``get_settings`` を直接利用する。
 モジュール分割中も既存のインポートを壊さないために残している。
 """
+from app.config.settings import AppSettings, get_settings
+
+__all__ = ["AppSettings", "get_settings"]
@@ -7,13 +7,43 @@ from functools import lru_cache
 from typing import Optional
 
 
-def _env_int(key: str, default: int) -> int:
+def _parse_int(value: Optional[str], default: int) -> int:
+    if value is None:
+        return default
     try:
-        return int(os.getenv(key, default))
+        return int(value)
     except (TypeError, ValueError):
         return default
 
 
+def _parse_bool(value: Optional[str], default: bool) -> bool:
+    if value is None:
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+# (フィールド名, 環境変数名)。既定値は AppSettings のフィールド定義を使う。
+_STR_FIELDS = (
+    ("app_env", "APP_ENV"),
+    ("redis_host", "REDIS_HOST"),
+    ("log_level", "LOG_LEVEL"),
+    ("log_file", "LOG_FILE"),
+    ("blender_system_scripts", "BLENDER_SYSTEM_SCRIPTS"),
+    ("conversion_temp_dir", "CONVERSION_TEMP_DIR"),
+)
+_INT_FIELDS = (
+    ("redis_port", "REDIS_PORT"),
+    ("redis_max_connections", "REDIS_MAX_CONNECTIONS"),
+    ("max_file_size", "MAX_FILE_SIZE"),
+    ("rate_limit_requests", "RATE_LIMIT_REQUESTS"),
+    ("rate_limit_window", "RATE_LIMIT_WINDOW"),
+    ("conversion_timeout", "CONVERSION_TIMEOUT"),
+    ("cache_duration", "CACHE_DURATION"),
+    ("conversion_workers", "CONVERSION_WORKERS"),
+)
+_BOOL_FIELDS = (("gltf_quantize", "GLTF_QUANTIZE"),)
+
+
 @dataclass(frozen=True)
 class AppSettings:
     """アプリ設定を一元管理し、簡易バリデーションを行う。"""
@@ -21,6 +51,7 @@ class AppSettings:
     app_env: str = "development"
     redis_host: str = "redis"
     redis_port: int = 6379
+    redis_max_connections: int = 32
     max_file_size: int = 50 * 1024 * 1024
     rate_limit_requests: int = 10
     rate_limit_window: int = 60
@@ -29,26 +60,22 @@ class AppSettings:
     log_level: str = "INFO"
     log_format: str = "plain"
     log_file: Optional[str] = None
+    blender_system_scripts: str = "/usr/local/blender/4.3/scripts"
+    gltf_quantize: bool = True
+    conversion_workers: int = 0
+    conversion_temp_dir: Optional[str] = None
 
     @staticmethod
     def from_env() -> "AppSettings":
-        log_format = os.getenv("LOG_FORMAT", "plain")
-        if log_format not in {"plain", "json"}:
-            log_format = "plain"
-
-        return AppSettings(
-            app_env=os.getenv("APP_ENV", "development"),
-            redis_host=os.getenv("REDIS_HOST", "redis"),
-            redis_port=_env_int("REDIS_PORT", 6379),
-            max_file_size=_env_int("MAX_FILE_SIZE", 50 * 1024 * 1024),
-            rate_limit_requests=_env_int("RATE_LIMIT_REQUESTS", 10),
-            rate_limit_window=_env_int("RATE_LIMIT_WINDOW", 60),
-            conversion_timeout=_env_int("CONVERSION_TIMEOUT", 300),
-            cache_duration=_env_int("CACHE_DURATION", 3600),
-            log_level=os.getenv("LOG_LEVEL", "INFO"),
-            log_format=log_format,
-            log_file=os.getenv("LOG_FILE"),
-        )
+        get = os.environ.get
+        values = {field: get(key, getattr(AppSettings, field)) for field, key in _STR_FIELDS}
+        values.update((field, _parse_int(get(key), getattr(AppSettings, field))) for field, key in _INT_FIELDS)
+        values.update((field, _parse_bool(get(key), getattr(AppSettings, field))) for field, key in _BOOL_FIELDS)
+
+        log_format = get("LOG_FORMAT", "plain")
+        values["log_format"] = log_format if log_format in {"plain", "json"} else "plain"
+
+        return AppSettings(**values)
 
     def is_local(self) -> bool:
         return self.app_env == "local"
@@ -1,8 +1,12 @@
+import os
 import sys
+import tempfile
+import threading
 import time
 import traceback
 from datetime import datetime
 from functools import wraps
+from typing import Optional, Tuple
 
 import redis
 from flask import Flask, jsonify, request
@@ -11,16 +15,22 @@ from werkzeug.utils import secure_filename
 
 from app.blender import clear_scene, initialize_blender, setup_addons
 from app.blender.io import export_file, import_file
+from app.blender.pool import ConversionPool, create_conversion_pool
 from app.config import get_settings
 from app.services.conversion_service import (
+    PERSISTENT_CACHE_DIR,
+    REQUEST_DIR_PREFIX,
     SUPPORTED_FORMATS,
     cache_conversion_result,
+    check_rate_limit,
     cleanup_temp_files,
     conversion_doc,  # re-exported for tests
     convert_file,
-    get_cached_conversion,
+    lookup_cached_conversion,
     process_conversion,
+    remove_stale_entries,
     run_conversion_with_timeout,
+    validate_file_content,
     validate_file_format,
     validate_file_size,
 )
@@ -41,15 +51,55 @@ def is_local_env() -> bool:
     return app_settings.is_local()
 
 
-# Redis connection for rate limiting and caching
-redis_client = redis.Redis(
-    host=app_settings.redis_host,
-    port=int(app_settings.redis_port),
-    db=0,
-    decode_responses=True,
-    socket_connect_timeout=5,
-    retry_on_timeout=True,
-)
+REDIS_HEALTH_CHECK_INTERVAL = 30
+# Seconds a request waits for a free pooled connection; a timeout is handled like Redis being down
+REDIS_POOL_TIMEOUT = 2
+
+# Load balancers probe /health far more often than Redis health needs re-checking
+HEALTH_CHECK_TTL = 5
+# (monotonic time of the last PING or None, "connected"/"disconnected")
+_redis_status: Tuple[Optional[float], str] = (None, "unknown")
+_redis_status_lock = threading.Lock()
+
+# Created on first use so a forked child never shares its parent's sockets
+_redis_client: Optional[redis.Redis] = None
+_redis_client_lock = threading.Lock()
+
+
+def get_redis() -> redis.Redis:
+    """レートリミットとキャッシュで共有する Redis クライアントを返す（初回呼び出し時に接続プールを作る）。"""
+    global _redis_client
+    if _redis_client is None:
+        with _redis_client_lock:
+            if _redis_client is None:
+                pool = redis.BlockingConnectionPool(
+                    host=app_settings.redis_host,
+                    port=int(app_settings.redis_port),
+                    db=0,
+                    decode_responses=True,
+                    socket_connect_timeout=5,
+                    socket_keepalive=True,
+                    retry_on_timeout=True,
+                    health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+                    max_connections=app_settings.redis_max_connections,
+                    timeout=REDIS_POOL_TIMEOUT,
+                )
+                _redis_client = redis.Redis(connection_pool=pool)
+    return _redis_client
+
+
+def _reset_redis_after_fork() -> None:
+    """フォーク後の子プロセスでは親の接続プールを使わず、次回の get_redis で作り直す。"""
+    global _redis_client, _redis_client_lock
+    _redis_client = None
+    _redis_client_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_redis_after_fork)
+
+# Per-request working directories; point CONVERSION_TEMP_DIR at a tmpfs to keep them off disk
+if app_settings.conversion_temp_dir:
+    os.makedirs(app_settings.conversion_temp_dir, exist_ok=True)
 
 # Configuration from environment variables
 MAX_FILE_SIZE = app_settings.max_file_size
@@ -58,39 +108,21 @@ RATE_LIMIT_WINDOW = app_settings.rate_limit_window
 CONVERSION_TIMEOUT = app_settings.conversion_timeout
 CACHE_DURATION = app_settings.cache_duration
 
+# Room for the multipart boundaries and part headers around the uploaded file
+MULTIPART_OVERHEAD = 64 * 1024
+# Werkzeug rejects larger bodies with 413 from Content-Length, before reading or spooling them
+app.config["MAX_CONTENT_LENGTH"] = MAX_FILE_SIZE + MULTIPART_OVERHEAD
 
-def rate_limit(f):
-    """Flaskルートにレートリミットを適用するデコレーター。"""
-
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        ip = request.remote_addr
-        now = int(time.time())
-        key = f"rate_limit:{ip}"
-
-        try:
-            pipe = redis_client.pipeline()
-            pipe.zremrangebyscore(key, 0, now - RATE_LIMIT_WINDOW)
-            pipe.zcard(key)
-            pipe.zadd(key, {str(now): now})
-            pipe.expire(key, RATE_LIMIT_WINDOW)
-            _, request_count, *_ = pipe.execute()
-
-            if request_count >= RATE_LIMIT_REQUESTS:
-                return jsonify({"error": "Rate limit exceeded"}), 429
-
-        except redis.RedisError as exc:
-            logger.error(f"Redis error in rate limiting: {exc}")
-            # Continue without rate limiting if Redis is unavailable
-            pass
-
-        return f(*args, **kwargs)
-
-    return decorated_function
+# Persistent Blender workers; started in __main__ when CONVERSION_WORKERS > 0
+conversion_pool: Optional[ConversionPool] = None
+# Without the pool, bpy lives in this process and can only run one conversion at a time
+_blender_lock = threading.Lock()
 
 
 def convert_file_with_timeout(input_path, output_path, input_format, output_format):
-    """タイムアウト付きで変換を実行するラッパー。依存を注入して呼び出す。"""
+    """タイムアウト付きで変換を実行するラッパー。ワーカープールがあればそちらへ委譲する。"""
+    if conversion_pool is not None:
+        return conversion_pool.convert(input_path, output_path, input_format, output_format)
 
     def conversion_callable():
         return convert_file(
@@ -104,11 +136,55 @@ def convert_file_with_timeout(input_path, output_path, input_format, output_form
             setup_addons_fn=setup_addons,
         )
 
-    return run_conversion_with_timeout(conversion_callable, CONVERSION_TIMEOUT)
+    # Waiting for the lock counts against the timeout, like queueing for a pool worker
+    return run_conversion_with_timeout(conversion_callable, CONVERSION_TIMEOUT, lock=_blender_lock)
+
+
+# Orphaned working directories and expired cache files are swept on this period (seconds)
+TEMP_SWEEP_INTERVAL = 15 * 60
+
+
+def sweep_temp_files() -> None:
+    """異常終了で残った作業ディレクトリと、Redis の TTL が切れたキャッシュファイルを削除する。"""
+    temp_root = app_settings.conversion_temp_dir or tempfile.gettempdir()
+    # A working directory older than one timeout plus a sweep period can no longer belong to a request
+    removed = remove_stale_entries(temp_root, CONVERSION_TIMEOUT + TEMP_SWEEP_INTERVAL, prefix=REQUEST_DIR_PREFIX)
+    removed += remove_stale_entries(PERSISTENT_CACHE_DIR, CACHE_DURATION)
+    if removed:
+        logger.info("Removed %d stale temporary entries", removed)
 
 
-def _validate_file_size_with_limit(file):
-    return validate_file_size(file, MAX_FILE_SIZE)
+def start_temp_sweeper() -> threading.Event:
+    """TEMP_SWEEP_INTERVAL ごとに sweep_temp_files を実行するデーモンスレッドを起動し、停止用のイベントを返す。"""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(TEMP_SWEEP_INTERVAL):
+            try:
+                sweep_temp_files()
+            except Exception as exc:
+                logger.error(f"Temporary file sweep failed: {exc}")
+
+    threading.Thread(target=run, name="temp-sweeper", daemon=True).start()
+    return stop
+
+
+def rate_limit(f):
+    """Flaskルートにレートリミットを適用するデコレーター。アップロード本文を読む前に判定する。"""
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        ip = request.remote_addr
+        if check_rate_limit(get_redis(), ip, limit=RATE_LIMIT_REQUESTS, window=RATE_LIMIT_WINDOW):
+            logger.warning(f"Rate limit exceeded for {ip}")
+            return jsonify({"error": "Rate limit exceeded"}), 429
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+def _validate_file_size_with_limit(size):
+    return validate_file_size(size, MAX_FILE_SIZE)
 
 
 def handle_conversion(request, input_format, output_format):
@@ -118,18 +194,16 @@ def handle_conversion(request, input_format, output_format):
         input_format=input_format,
         output_format=output_format,
         settings=app_settings,
-        redis_client=redis_client,
+        redis_client=get_redis(),
         convert_func=convert_file_with_timeout,
         validate_format_fn=validate_file_format,
         validate_size_fn=_validate_file_size_with_limit,
-        get_cached_fn=lambda input_path, fmt: get_cached_conversion(
-            redis_client, input_path, fmt
-        ),
-        cache_result_fn=lambda input_path, output_path, fmt: cache_conversion_result(
-            redis_client, input_path, output_path, fmt, CACHE_DURATION
+        validate_content_fn=validate_file_content,
+        get_cached_fn=lambda file_hash, fmt: lookup_cached_conversion(get_redis(), file_hash, fmt),
+        cache_result_fn=lambda file_hash, output_path, fmt: cache_conversion_result(
+            get_redis(), file_hash, output_path, fmt, CACHE_DURATION
         ),
         cleanup_fn=cleanup_temp_files,
-        clear_scene_fn=clear_scene,
         supported_formats=SUPPORTED_FORMATS,
     )
 
@@ -153,7 +227,9 @@ def too_many_requests(error):
     return jsonify({"error": "Rate limit exceeded"}), 429
 
 
-# Apply rate limiting to all conversion endpoints
+# Counted before request.files is touched, so rejected clients never have their upload parsed or hashed.
+# The cache GET needs the upload's hash and so cannot join this pipeline: a conversion request costs one
+# round-trip here plus at most one GET (none on an in-process LRU hit)
 @app.route("/convert", methods=["POST"])
 @rate_limit
 @swag_from(
@@ -194,6 +270,10 @@ def convert_generic():
     if not output_format:
         return jsonify({"error": "output_format query parameter is required"}), 400
 
+    # Checked before request.files so a bad query is rejected without parsing the upload body
+    if output_format not in SUPPORTED_FORMATS:
+        return jsonify({"error": f"Unsupported output format: {output_format}"}), 400
+
     if "file" not in request.files:
         return jsonify({"error": "No file provided"}), 400
 
@@ -201,35 +281,42 @@ def convert_generic():
     if file.filename == "":
         return jsonify({"error": "No file selected"}), 400
 
-    filename = secure_filename(file.filename)
-    if "." not in filename:
+    _, dot, extension = secure_filename(file.filename).rpartition(".")
+    if not dot:
         return jsonify({"error": "File has no extension"}), 400
 
-    input_format = filename.rsplit(".", 1)[1].lower()
+    input_format = extension.lower()
 
     if input_format not in SUPPORTED_FORMATS:
         return jsonify({"error": f"Unsupported input format: {input_format}"}), 400
 
-    if output_format not in SUPPORTED_FORMATS:
-        return jsonify({"error": f"Unsupported output format: {output_format}"}), 400
-
     return handle_conversion(request, input_format, output_format)
 
 
+def redis_health() -> str:
+    """Redis の疎通状態を返す。直近 HEALTH_CHECK_TTL 秒以内に確認済みなら PING を送らずその結果を使う。"""
+    global _redis_status
+    with _redis_status_lock:
+        checked_at, status = _redis_status
+        now = time.monotonic()
+        if checked_at is None or now - checked_at >= HEALTH_CHECK_TTL:
+            try:
+                get_redis().ping()
+                status = "connected"
+            except redis.RedisError:
+                status = "disconnected"
+            _redis_status = (now, status)
+        return status
+
+
 @app.route("/health", methods=["GET"])
 def health_check():
     """ヘルスチェックとRedis疎通を返すエンドポイント。"""
-    try:
-        redis_client.ping()
-        redis_status = "connected"
-    except redis.RedisError:
-        redis_status = "disconnected"
-
     return (
         jsonify(
             {
                 "status": "healthy",
-                "redis": redis_status,
+                "redis": redis_health(),
                 "timestamp": datetime.utcnow().isoformat(),
             }
         ),
@@ -250,9 +337,14 @@ if __name__ == "__main__":
             logger.error(f"Failed to setup addons: {error}")
             sys.exit(1)
 
+        conversion_pool = create_conversion_pool(app_settings.conversion_workers, CONVERSION_TIMEOUT)
+        start_temp_sweeper()
+
         logger.info("Initialization complete")
 
-        app.run(host="0.0.0.0", port=5000, debug=False, threaded=False)
+        # Only conversions are serialized (by the pool or _blender_lock); uploads, cache hits and
+        # /health are served concurrently
+        app.run(host="0.0.0.0", port=5000, debug=False, threaded=True)
     except Exception as exc:
         logger.error(f"Fatal error: {exc}")
         logger.error(traceback.format_exc())
@@ -3,12 +3,16 @@
 from .conversion_service import (
     SUPPORTED_FORMATS,
     cache_conversion_result,
+    check_rate_limit,
     cleanup_temp_files,
     conversion_doc,
     convert_file,
-    get_cached_conversion,
+    lookup_cached_conversion,
     process_conversion,
+    queue_rate_limit,
+    remove_stale_entries,
     run_conversion_with_timeout,
+    validate_file_content,
     validate_file_format,
     validate_file_size,
 )
@@ -16,12 +20,16 @@ from .conversion_service import (
 __all__ = [
     "SUPPORTED_FORMATS",
     "cache_conversion_result",
+    "check_rate_limit",
     "cleanup_temp_files",
     "conversion_doc",
     "convert_file",
-    "get_cached_conversion",
+    "lookup_cached_conversion",
     "process_conversion",
+    "queue_rate_limit",
+    "remove_stale_entries",
     "run_conversion_with_timeout",
+    "validate_file_content",
     "validate_file_format",
     "validate_file_size",
 ]
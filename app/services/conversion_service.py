@@ -1,32 +1,94 @@
+import contextlib
 import hashlib
 import io
+import ipaddress
+import logging
 import mimetypes
+import mmap
 import os
 import shutil
+import stat
 import sys
 import tempfile
+import threading
+import time
 import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from functools import lru_cache
 from typing import Any, Callable, Dict, Optional, Tuple
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 
 import bpy
-
 from flask import jsonify, send_file
 from werkzeug.utils import secure_filename
 
-from app.blender import clear_scene, handle_blender_error, import_file, setup_addons, export_file
+from app.blender import clear_scene, export_file, handle_blender_error, import_file, setup_addons
 from app.utils.logger import AppLogger
 
+try:
+    import blake3
+except ImportError:
+    # Optional: fall back to hashlib SHA-256 when blake3 is not installed
+    blake3 = None
+
 logger = AppLogger.get_logger(__name__)
 PERSISTENT_CACHE_DIR = os.getenv("CONVERSION_CACHE_DIR", "/tmp/convert_cache")
+# Part of the cache key so switching algorithms never matches entries written by the other one
+HASH_ALGORITHM = "blake3" if blake3 is not None else "sha256"
+
+# アップロードを作業ディレクトリへコピーする際のバッファサイズ
+UPLOAD_COPY_BUFFER_SIZE = 1024 * 1024
+
+# リクエストごとの作業ディレクトリ名の接頭辞（既定のキャッシュディレクトリ名 convert_cache とは重ならない）
+REQUEST_DIR_PREFIX = "convert_req_"
+
+# プロセス内LRUに保持する変換キャッシュの最大件数
+LOCAL_CACHE_SIZE = 256
+# キャッシュキー -> (キャッシュ済みファイルのパス, 有効期限の monotonic 時刻)
+_local_cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+_local_cache_lock = threading.Lock()
+
+# レートリミットを共有するネットワークのプレフィックス長（IPv6は1ホストに/64が割り当てられるのが一般的）
+RATE_LIMIT_IPV4_PREFIX = 24
+RATE_LIMIT_IPV6_PREFIX = 64
+
+# 形式ごとの許容MIMEタイプ（先頭がレスポンスの Content-Type）
+SUPPORTED_FORMATS: Dict[str, Tuple[str, ...]] = {
+    "fbx": ("application/octet-stream", "application/x-autodesk-fbx"),
+    "obj": ("application/x-tgif", "text/plain", "application/octet-stream"),
+    "gltf": ("model/gltf+json", "application/json"),
+    "glb": ("model/gltf-binary",),
+    "vrm": ("application/octet-stream", "model/gltf-binary", "model/vrml"),
+    "bvh": ("application/octet-stream",),
+}
+
 
-SUPPORTED_FORMATS: Dict[str, list] = {
-    "fbx": ["application/octet-stream", "application/x-autodesk-fbx"],
-    "obj": ["application/x-tgif", "text/plain", "application/octet-stream"],
-    "gltf": ["model/gltf+json", "application/json"],
-    "glb": ["model/gltf-binary"],
-    "vrm": ["application/octet-stream", "model/gltf-binary", "model/vrml"],
-    "bvh": ["application/octet-stream"],
+# Sanitised file names are fixed per format, so secure_filename runs once per format here
+_INPUT_NAMES: Dict[str, str] = {fmt: secure_filename(f"input.{fmt}") for fmt in SUPPORTED_FORMATS}
+_OUTPUT_NAMES: Dict[str, str] = {fmt: secure_filename(f"converted.{fmt}") for fmt in SUPPORTED_FORMATS}
+
+# The extension check fixes the guessed MIME type, so both lookups are resolved once here
+_FORMAT_SUFFIXES: Dict[str, str] = {fmt: f".{fmt}" for fmt in SUPPORTED_FORMATS}
+_GUESSED_MIME_TYPES: Dict[str, Optional[str]] = {
+    fmt: mimetypes.guess_type(f"file.{fmt}")[0] for fmt in SUPPORTED_FORMATS
+}
+_ALLOWED_MIME_TYPES: Dict[str, frozenset] = {fmt: frozenset(mimes) for fmt, mimes in SUPPORTED_FORMATS.items()}
+
+
+# バイナリ形式の先頭バイト（VRMはGLBコンテナ）
+GLB_MAGIC = b"glTF"
+FBX_BINARY_MAGIC = b"Kaydara FBX Binary"
+# 形式判定に必要な先頭バイト数
+SNIFF_LENGTH = max(len(GLB_MAGIC), len(FBX_BINARY_MAGIC))
+# 宣言された入力形式ごとに許容する判定結果（None は先頭バイトから判定できないテキスト形式など）
+_SNIFF_COMPATIBLE: Dict[str, frozenset] = {
+    "fbx": frozenset({None, "fbx"}),
+    "obj": frozenset({None}),
+    "gltf": frozenset({None}),
+    "glb": frozenset({"glb"}),
+    "vrm": frozenset({"glb"}),
+    "bvh": frozenset({None}),
 }
 
 
@@ -55,23 +117,39 @@ def conversion_doc(input_format: str, output_format: str) -> Dict[str, Any]:
 
 def validate_file_format(file, format: str) -> Tuple[bool, Optional[str]]:
     """拡張子とMIMEタイプを検証する。"""
-    if not file.filename.lower().endswith(f".{format}"):
+    if not file.filename.lower().endswith(_FORMAT_SUFFIXES.get(format) or f".{format}"):
         return False, f"File must have .{format} extension"
 
-    mime_type = mimetypes.guess_type(file.filename)[0]
-    if mime_type and format in SUPPORTED_FORMATS:
-        if mime_type not in SUPPORTED_FORMATS[format]:
-            return False, f"Invalid MIME type: {mime_type}"
+    mime_type = _GUESSED_MIME_TYPES.get(format)
+    if mime_type and mime_type not in _ALLOWED_MIME_TYPES[format]:
+        return False, f"Invalid MIME type: {mime_type}"
+
+    return True, None
+
+
+def _sniff_format(buf) -> Optional[str]:
+    """先頭バイトからバイナリ形式を判定する。判定できない場合はNone。"""
+    if buf[: len(GLB_MAGIC)] == GLB_MAGIC:
+        return "glb"
+    if buf[: len(FBX_BINARY_MAGIC)] == FBX_BINARY_MAGIC:
+        return "fbx"
+    return None
 
+
+def validate_file_content(file_content, format: str) -> Tuple[bool, Optional[str]]:
+    """アップロード内容の先頭バイトが宣言された形式と矛盾しないかを、Blenderを起動する前に検証する。"""
+    allowed = _SNIFF_COMPATIBLE.get(format)
+    if allowed is not None and _sniff_format(memoryview(file_content)) not in allowed:
+        return False, f"File content does not match .{format} format"
     return True, None
 
 
-def validate_file_size(file, max_file_size: int) -> Tuple[bool, Optional[str], bool]:
+def validate_file_size(size: int, max_file_size: int) -> Tuple[bool, Optional[str], bool]:
     """
     設定上限に対してファイルサイズを検証する。
 
     Args:
-        file: サイズを検証するファイルオブジェクト。先頭から読み取り可能であることを想定する。
+        size: 読み込み済みのアップロード内容のサイズ（バイト単位）。
         max_file_size: 許可される最大ファイルサイズ（バイト単位）。
 
     Returns:
@@ -80,10 +158,6 @@ def validate_file_size(file, max_file_size: int) -> Tuple[bool, Optional[str], b
             - 2要素目: エラーメッセージ。不正な場合にメッセージ文字列、それ以外は None。
             - 3要素目: 上限超過によるエラーかどうか。サイズが上限を超えている場合に True。
     """
-    file.seek(0, os.SEEK_END)
-    size = file.tell()
-    file.seek(0)
-
     if size > max_file_size:
         return (
             False,
@@ -97,51 +171,194 @@ def validate_file_size(file, max_file_size: int) -> Tuple[bool, Optional[str], b
 
 
 def calculate_file_hash(file_path: str) -> str:
-    """ファイルのSHA-256ハッシュを計算する。"""
-    sha256_hash = hashlib.sha256()
+    """ファイルのハッシュを計算する（どちらのアルゴリズムでも mmap した内容を1回で渡す）。"""
+    if blake3 is not None:
+        hasher = blake3.blake3(max_threads=blake3.blake3.AUTO)
+        hasher.update_mmap(file_path)
+        return hasher.hexdigest()
+    hasher = hashlib.sha256()
     with open(file_path, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(byte_block)
-    return sha256_hash.hexdigest()
+        # mmap rejects empty files; the digest of no bytes needs no update
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if hasattr(mapped, "madvise"):
+                    mapped.madvise(mmap.MADV_SEQUENTIAL)
+                hasher.update(mapped)
+    return hasher.hexdigest()
+
+
+def conversion_cache_key(file_hash: str, output_format: str) -> str:
+    """入力ハッシュと出力形式から変換キャッシュのRedisキーを生成する。"""
+    return f"conversion:{HASH_ALGORITHM}:{file_hash}:{output_format}"
+
+
+def _local_cache_get(cache_key: str) -> Optional[str]:
+    """プロセス内LRUからキャッシュ済みのパスを取得する。期限切れならNone（ファイルの存在は確認しない）。"""
+    with _local_cache_lock:
+        entry = _local_cache.get(cache_key)
+        if entry is None:
+            return None
+        path, expires_at = entry
+        if expires_at > time.monotonic():
+            _local_cache.move_to_end(cache_key)
+            return path
+        del _local_cache[cache_key]
+    return None
 
 
-def get_cached_conversion(redis_client, input_path: str, output_format: str) -> Optional[str]:
-    """キャッシュ済みの変換結果を取得する。"""
+def _local_cache_put(cache_key: str, path: str, cache_duration: int) -> None:
+    """プロセス内LRUにキャッシュ済みのパスを登録し、上限を超えた古いものから破棄する。"""
+    with _local_cache_lock:
+        _local_cache[cache_key] = (path, time.monotonic() + cache_duration)
+        _local_cache.move_to_end(cache_key)
+        if len(_local_cache) > LOCAL_CACHE_SIZE:
+            _local_cache.popitem(last=False)
+
+
+@lru_cache(maxsize=8192)
+def rate_limit_network(client_id: str) -> str:
+    """クライアントIPをレートリミットの集計単位（IPv4は/24、IPv6は/64のネットワーク）に丸める。
+
+    IPアドレスとして解釈できない識別子はそのまま返す。
+    """
     try:
-        file_hash = calculate_file_hash(input_path)
-        cache_key = f"conversion:{file_hash}:{output_format}"
+        address = ipaddress.ip_address(client_id)
+    except ValueError:
+        return client_id
+    prefix = RATE_LIMIT_IPV4_PREFIX if address.version == 4 else RATE_LIMIT_IPV6_PREFIX
+    return str(ipaddress.ip_network((address, prefix), strict=False))
+
+
+def queue_rate_limit(pipe, client_id: str, now: int, window: int) -> None:
+    """固定ウィンドウ方式のレートリミット用コマンドをパイプラインに積む（実行はしない）。
+
+    積んだ2コマンドのうち1番目（INCR）の結果が、今回を含む現在のウィンドウ内のリクエスト数になる。
+    カウンタはクライアントのネットワーク（`rate_limit_network`）単位で共有する。
+    キーはウィンドウごとに切り替わるため、EXPIRE で延長されても最大2ウィンドウ分で消える。
+    """
+    key = f"rate_limit:{rate_limit_network(client_id)}:{now // window}"
+    pipe.incr(key)
+    pipe.expire(key, window)
+
+
+def check_rate_limit(redis_client, client_id: str, *, limit: int, window: int) -> bool:
+    """
+    クライアントのリクエストを1件数え、現在のウィンドウ内で上限を超えていれば True を返す。
+
+    INCR と EXPIRE を1回のパイプライン実行（1往復）で送る。アップロード本文を読む前に呼ぶ。
+
+    Args:
+        redis_client: `pipeline()` をサポートする Redis クライアント。
+        client_id: レートリミットの単位となるクライアント識別子（IPアドレスなど）。
+        limit: ウィンドウ内で許可するリクエスト数。
+        window: レートリミットのウィンドウ幅（秒）。
+
+    Returns:
+        bool: レートリミット超過かどうか。
+            Redis が利用できない場合や INCR がエラーを返した場合（maxmemory 到達時など）は
+            レートリミットなしとして False を返す。
+    """
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        queue_rate_limit(pipe, client_id, int(time.time()), window)
+        count = pipe.execute(raise_on_error=False)[0]
+    except Exception as exc:
+        # Continue without rate limiting if Redis is unavailable
+        logger.error(f"Error checking rate limit: {exc}")
+        return False
 
-        cached_path = redis_client.get(cache_key)
-        if cached_path and os.path.exists(cached_path):
-            return cached_path
+    if isinstance(count, Exception):
+        # A rejected INCR (e.g. OOM under maxmemory) must not fail the request
+        logger.error(f"Error checking rate limit: {count}")
+        return False
+    return count > limit
+
+
+def lookup_cached_conversion(redis_client, file_hash: str, output_format: str) -> Optional[str]:
+    """
+    入力ハッシュに対応するキャッシュ済み変換結果のパスを返す。無ければ None。
 
+    プロセス内LRUにあるキーは Redis へ問い合わせない。Redis が利用できない場合はキャッシュなしとする。
+    返すパスのファイルが削除済みの場合もあり、送信時（`send_file` の stat）に検出する。
+
+    Args:
+        redis_client: `get()` をサポートする Redis クライアント。
+        file_hash: 入力ファイルのハッシュ（`calculate_file_hash` の戻り値）。
+        output_format: 変換後のフォーマット。
+    """
+    cache_key = conversion_cache_key(file_hash, output_format)
+    cached_path = _local_cache_get(cache_key)
+    if cached_path is not None:
+        return cached_path
+    try:
+        return redis_client.get(cache_key) or None
     except Exception as exc:
         logger.error(f"Error accessing cache: {exc}")
+        return None
 
-    return None
+
+def _copy_into_cache(src: str, dst: str) -> None:
+    """変換結果をキャッシュへコピーする。
+
+    対応するファイルシステムでは copy_file_range でカーネル内コピー（reflink）にする。
+    """
+    try:
+        with open(src, "rb") as source, open(dst, "wb") as target:
+            remaining = os.fstat(source.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(source.fileno(), target.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+            if remaining == 0:
+                return
+    except (AttributeError, OSError):
+        # No copy_file_range (non-Linux) or unsupported across these filesystems
+        pass
+    shutil.copyfile(src, dst)
+
+
+def _store_in_cache(src: str, dst: str) -> None:
+    """変換結果をキャッシュへ置く。同じファイルシステム上ならハードリンクにしてデータをコピーしない。"""
+    # Linked under a private name first so an existing entry for the same hash is replaced atomically
+    staging_path = f"{dst}.{os.getpid()}.{threading.get_ident()}"
+    try:
+        os.link(src, staging_path)
+    except OSError:
+        # Cache on another filesystem (EXDEV) or no hard-link support
+        _copy_into_cache(src, dst)
+        return
+    try:
+        os.replace(staging_path, dst)
+    except OSError:
+        # The staging name is unique to this thread, so nothing else would ever remove it
+        os.unlink(staging_path)
+        raise
 
 
 def cache_conversion_result(
-    redis_client, input_path: str, output_path: str, output_format: str, cache_duration: int
+    redis_client, file_hash: str, output_path: str, output_format: str, cache_duration: int
 ) -> None:
-    """成功した変換結果をキャッシュする。
+    """成功した変換結果をキャッシュする（Redis とプロセス内LRUの両方へ登録する）。
 
     Args:
         redis_client: 変換結果のパスを保存するための Redis クライアントインスタンス。
             `setex(key, seconds, value)` メソッドをサポートしている必要がある。
-        input_path (str): 入力ファイルのパス。キャッシュキー生成のためにハッシュ計算に使用する。
-        output_path (str): 変換後ファイルのパス。永続キャッシュディレクトリへコピーされる。
+        file_hash (str): 入力ファイルのハッシュ。キャッシュキーとキャッシュファイル名に使用する。
+        output_path (str): 変換後ファイルのパス。
+            永続キャッシュディレクトリへリンク（別ファイルシステムならコピー）される。
         output_format (str): 変換後ファイルのフォーマット（例: "fbx", "gltf" など）。
         cache_duration (int): キャッシュの有効期限（TTL）を秒単位で指定する。
     """
     try:
-        file_hash = calculate_file_hash(input_path)
-        cache_key = f"conversion:{file_hash}:{output_format}"
+        cache_key = conversion_cache_key(file_hash, output_format)
 
         os.makedirs(PERSISTENT_CACHE_DIR, exist_ok=True)
         cached_copy_path = os.path.join(PERSISTENT_CACHE_DIR, f"{file_hash}.{output_format}")
-        shutil.copy2(output_path, cached_copy_path)
+        # The request directory is removed with rmtree later; the link keeps the cached inode alive
+        _store_in_cache(output_path, cached_copy_path)
 
+        _local_cache_put(cache_key, cached_copy_path, cache_duration)
         redis_client.setex(cache_key, cache_duration, cached_copy_path)
 
     except Exception as exc:
@@ -159,6 +376,57 @@ def cleanup_temp_files(temp_dir: str) -> bool:
         return False
 
 
+def remove_stale_entries(directory: str, max_age: float, prefix: str = "") -> int:
+    """
+    ディレクトリ直下のエントリのうち、最終更新から max_age 秒以上経過したものを削除する。
+
+    リクエスト処理中に異常終了したプロセスが残した作業ディレクトリや、
+    Redis 上の TTL が切れたキャッシュファイルを定期的に片付けるために使う。
+
+    Args:
+        directory: 走査するディレクトリ。存在しない場合は何もしない。
+        max_age: 削除対象とする経過秒数。処理中のリクエストを消さないよう十分に長く取る。
+        prefix: 指定した場合、この接頭辞で始まる名前のエントリのみを対象とする。
+
+    Returns:
+        int: 削除したエントリ数。
+    """
+    cutoff = time.time() - max_age
+    removed = 0
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return 0
+    with entries:
+        for entry in entries:
+            if not entry.name.startswith(prefix):
+                continue
+            try:
+                if entry.stat(follow_symlinks=False).st_mtime >= cutoff:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.unlink(entry.path)
+                removed += 1
+            except OSError as exc:
+                logger.warning(f"Error removing stale entry {entry.path}: {exc}")
+    return removed
+
+
+def _detach_upload(stream):
+    """リクエスト終了時に閉じられるアップロードのストリームから、レスポンス本文に使える独立したファイルを得る。
+
+    ディスクに退避済みのパートは同じファイルを指す新しいディスクリプタで開き直し、
+    メモリ上の小さなパートのみ内容をコピーする。
+    """
+    try:
+        fd = stream.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return io.BytesIO(stream.read())
+    return os.fdopen(os.dup(fd), "rb")
+
+
 def convert_file(
     input_path: str,
     output_path: str,
@@ -172,88 +440,84 @@ def convert_file(
 ):
     """Blenderを用いてファイルを別形式へ変換する。(成功可否, メッセージ)を返す。"""
     try:
-        logger.info("=== Starting conversion process ===")
-        logger.info(f"System info: {bpy.app.version_string}")  # type: ignore[name-defined]
-        logger.info(f"Python version: {sys.version}")
-        logger.info(f"Working directory: {os.getcwd()}")
-        logger.info(f"Input file exists: {os.path.exists(input_path)}")
-        logger.info(f"Input file size: {os.path.getsize(input_path)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Blender %s, Python %s, working directory %s",
+                bpy.app.version_string,  # type: ignore[name-defined]
+                sys.version,
+                os.getcwd(),
+            )
 
         sys.excepthook = handle_blender_error
 
-        logger.info("Checking Blender addons...")
         success, error = setup_addons_fn()
         if not success:
             logger.error(f"Addon setup failed: {error}")
             return False, error
 
-        if not os.path.exists(input_path):
+        # One stat answers existence, readability and size; the input was written by this process
+        try:
+            input_stat = os.stat(input_path)
+        except FileNotFoundError:
             logger.error(f"Input file does not exist: {input_path}")
             return False, "Input file does not exist"
 
-        if not os.access(input_path, os.R_OK):
+        if not input_stat.st_mode & stat.S_IRUSR:
             logger.error(f"Input file is not readable: {input_path}")
             return False, "Input file is not readable"
 
-        logger.info(f"Input file exists and is readable: {input_path}")
-
-        if os.path.getsize(input_path) == 0:
+        if input_stat.st_size == 0:
             logger.error(f"Input file is empty: {input_path}")
             return False, "Input file is empty"
 
+        logger.info(
+            "Converting %s (%d bytes) from %s to %s", input_path, input_stat.st_size, input_format, output_format
+        )
+
         success, error = clear_scene_fn()
         if not success:
             logger.error(f"Failed to clear scene: {error}")
             return False, error
-        logger.info("Scene cleared successfully")
 
         try:
-            logger.info(f"Attempting to import file: {input_path}")
-            logger.info(f"Current working directory: {os.getcwd()}")
-            logger.info(f"File size: {os.path.getsize(input_path)} bytes")
-
             success, error = importer(input_path, input_format)
             if not success:
                 logger.error(f"Failed to import file: {error}")
                 return False, error
 
-            logger.info("File imported successfully")
-            logger.info(f"Number of objects in scene: {len(bpy.data.objects)}")  # type: ignore[name-defined]
-            logger.info("Scene statistics:")
-            logger.info(f"- Meshes: {len(bpy.data.meshes)}")  # type: ignore[name-defined]
-            logger.info(f"- Materials: {len(bpy.data.materials)}")  # type: ignore[name-defined]
-            logger.info(f"- Textures: {len(bpy.data.textures)}")  # type: ignore[name-defined]
-            logger.info(f"- Images: {len(bpy.data.images)}")  # type: ignore[name-defined]
-
-            for obj in bpy.data.objects:  # type: ignore[name-defined]
-                logger.info(f"Object: {obj.name}, Type: {obj.type}")
+            logger.info("File imported successfully (%d objects)", len(bpy.data.objects))  # type: ignore[name-defined]
+            if logger.isEnabledFor(logging.DEBUG):
+                data = bpy.data  # type: ignore[name-defined]
+                logger.debug(
+                    "Scene statistics: meshes=%d materials=%d textures=%d images=%d",
+                    len(data.meshes),
+                    len(data.materials),
+                    len(data.textures),
+                    len(data.images),
+                )
+                for obj in data.objects:
+                    logger.debug("Object: %s, Type: %s", obj.name, obj.type)
         except Exception as exc:
             logger.error(f"Exception during import: {exc}")
             logger.error(traceback.format_exc())
             return False, f"Import error: {exc}"
 
         try:
-            logger.info(f"Attempting to export to {output_format} at path: {output_path}")
-            output_dir = os.path.dirname(output_path)
-            if not os.path.exists(output_dir):
-                logger.info(f"Creating output directory: {output_dir}")
-                os.makedirs(output_dir, exist_ok=True)
-
-            if not os.access(output_dir, os.W_OK):
-                logger.error(f"Output directory is not writable: {output_dir}")
-                return False, "Output directory is not writable"
+            logger.info("Attempting to export to %s at path: %s", output_format, output_path)
+            # Not created here: a missing directory means the request gave up and cleaned up already
 
             success, error = exporter(output_path, output_format)
             if not success:
                 logger.error(f"Failed to export file: {error}")
                 return False, error
 
-            if not os.path.exists(output_path):
+            try:
+                file_size = os.stat(output_path).st_size
+            except FileNotFoundError:
                 logger.error(f"Export file was not created at {output_path}")
                 return False, "Export file was not created"
 
-            file_size = os.path.getsize(output_path)
-            logger.info(f"File exported successfully to {output_path} (size: {file_size} bytes)")
+            logger.info("File exported successfully to %s (size: %d bytes)", output_path, file_size)
             return True, "Conversion successful"
 
         except Exception as exc:
@@ -267,15 +531,38 @@ def convert_file(
         sys.excepthook = sys.__excepthook__
 
 
-def run_conversion_with_timeout(convert_func: Callable, timeout_seconds: int) -> Tuple[bool, str]:
-    """指定した変換関数をタイムアウト付きで実行する（スレッド実行でクロスプラットフォーム対応）。"""
-    with ThreadPoolExecutor(max_workers=1) as executor:
-        future = executor.submit(convert_func)
-        try:
-            return future.result(timeout=timeout_seconds)
-        except FuturesTimeout:
-            future.cancel()
-            return False, "Conversion timed out"
+# One thread, matching the Blender lock in-process conversions run under: extra threads would only park
+# behind the lock (or behind a timed-out job that keeps running). Queued jobs whose request timed out are
+# cancelled before they start
+_CONVERSION_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="convert")
+
+
+def run_conversion_with_timeout(
+    convert_func: Callable, timeout_seconds: int, lock: Optional[threading.Lock] = None
+) -> Tuple[bool, str]:
+    """指定した変換関数をタイムアウト付きで実行する（スレッド実行でクロスプラットフォーム対応）。
+
+    lock を渡すと、そのロックを取得してから変換する。ロック待ちの間にタイムアウトした変換は実行せずに破棄する。
+    実行中の変換は中断できないため、タイムアウト時はスレッドの終了を待たずに戻る。
+    打ち切りが必要な場合は `CONVERSION_WORKERS` によるワーカープール（タイムアウト時に強制終了）を使う。
+    """
+    timed_out = threading.Event()
+
+    def run():
+        with lock if lock is not None else contextlib.nullcontext():
+            # The request has already returned and removed its working directory
+            if timed_out.is_set():
+                return False, "Conversion timed out"
+            return convert_func()
+
+    future = _CONVERSION_EXECUTOR.submit(run)
+    try:
+        return future.result(timeout=timeout_seconds)
+    except FuturesTimeout:
+        timed_out.set()
+        future.cancel()
+        logger.error(f"Conversion timed out after {timeout_seconds}s; a conversion already running is left to finish")
+        return False, "Conversion timed out"
 
 
 def process_conversion(
@@ -288,11 +575,11 @@ def process_conversion(
     convert_func: Callable,
     validate_format_fn: Callable,
     validate_size_fn: Callable,
+    validate_content_fn: Callable,
     get_cached_fn: Callable,
     cache_result_fn: Callable,
     cleanup_fn: Callable,
-    clear_scene_fn: Callable,
-    supported_formats: Dict[str, list] = SUPPORTED_FORMATS,
+    supported_formats: Dict[str, Tuple[str, ...]] = SUPPORTED_FORMATS,
 ):
     """
     検証・キャッシュ確認・変換実行・レスポンス生成までを統括するハンドラ。
@@ -322,21 +609,23 @@ def process_conversion(
         戻り値は (成功したか, エラーメッセージ)。
     validate_size_fn : Callable
         ファイルサイズの検証を行う関数。
-        シグネチャ例: `(file_storage) -> Tuple[bool, str, bool]`
+        シグネチャ: `(size: int) -> Tuple[bool, str, bool]`
         戻り値は (成功したか, エラーメッセージ, サイズ超過かどうか)。
+    validate_content_fn : Callable
+        ファイル先頭のマジックバイトが入力形式と矛盾しないかを検証する関数。
+        シグネチャ: `(header: bytes, input_format) -> Tuple[bool, Optional[str]]`
+        アップロードの先頭 `SNIFF_LENGTH` バイトのみが渡される。
     get_cached_fn : Callable
-        既存の変換結果をキャッシュから取得する関数。
-        シグネチャ例: `(cache_key, redis_client) -> Optional[bytes]` などを想定。
+        キャッシュ済みの変換結果を参照する関数。レートリミットは呼び出し側がアップロード本文を読む前に判定する。
+        シグネチャ: `(file_hash, output_format) -> Optional[str]`
+        戻り値はキャッシュ済み変換結果のパスまたはNone。
     cache_result_fn : Callable
         変換結果をキャッシュに保存する関数。
-        シグネチャ例: `(cache_key, data, redis_client) -> None` などを想定。
+        シグネチャ: `(file_hash, output_path, output_format) -> None`
     cleanup_fn : Callable
         一時ディレクトリや一時ファイルを削除するためのクリーンアップ関数。
         シグネチャ例: `(temp_dir: str) -> None`。
-    clear_scene_fn : Callable
-        Blender のシーンをクリアし、状態をリセットする関数。
-        変換処理後や例外発生時に呼び出されることを想定。
-    supported_formats : Dict[str, list], optional
+    supported_formats : Dict[str, Tuple[str, ...]], optional
         サポートされている入力/出力フォーマットのマッピング。
         既定値はモジュールレベルの `SUPPORTED_FORMATS`。
 
@@ -355,48 +644,75 @@ def process_conversion(
         file = request.files["file"]
         if file.filename == "":
             return jsonify({"error": "No file selected"}), 400
-        file_content = file.read()
 
         success, error = validate_format_fn(file, input_format)
         if not success:
             logger.error(f"File format validation failed: {error}")
             return jsonify({"error": error}), 400
 
-        success, error, too_large = validate_size_fn(file)
+        # Only the leading bytes are read into memory; the size comes from seeking the spooled part
+        stream = file.stream
+        header = stream.read(SNIFF_LENGTH)
+        file_size = stream.seek(0, os.SEEK_END)
+        stream.seek(0)
+
+        success, error, too_large = validate_size_fn(file_size)
         if not success:
             logger.error(f"File size validation failed: {error}")
             status_code = 413 if too_large else 400
             return jsonify({"error": error}), status_code
 
-        temp_dir = tempfile.mkdtemp(prefix="convert_")
-        logger.info(f"Created temporary directory: {temp_dir}")
+        success, error = validate_content_fn(header, input_format)
+        if not success:
+            logger.error(f"File content validation failed: {error}")
+            return jsonify({"error": error}), 400
 
-        input_filename = secure_filename(f"input.{input_format}")
-        input_path = os.path.join(temp_dir, input_filename)
-        with open(input_path, "wb") as f:
-            f.write(file_content)
-        logger.info(f"Saved input file: {input_path}")
+        output_filename = _OUTPUT_NAMES.get(output_format) or secure_filename(f"converted.{output_format}")
 
-        cached_path = get_cached_fn(input_path, output_format)
-        if cached_path:
-            logger.info("Using cached conversion result")
+        if input_format == output_format:
+            # Nothing to convert: return the validated upload without a working directory or Blender.
+            # The request has already been counted by the route's rate limit, like any conversion
+            logger.info("Input and output formats match; returning the upload unchanged")
             return send_file(
-                cached_path,
+                _detach_upload(stream),
                 as_attachment=True,
-                download_name=secure_filename(f"converted.{output_format}"),
+                download_name=output_filename,
                 mimetype=supported_formats[output_format][0],
+                max_age=0,
             )
 
-        output_filename = secure_filename(f"converted.{output_format}")
+        # One directory per request: glTF (separate) exports write .bin and texture files next to the output
+        temp_dir = tempfile.mkdtemp(prefix=REQUEST_DIR_PREFIX, dir=settings.conversion_temp_dir)
+        logger.info(f"Created temporary directory: {temp_dir}")
+
+        input_filename = _INPUT_NAMES.get(input_format) or secure_filename(f"input.{input_format}")
+        input_path = os.path.join(temp_dir, input_filename)
+        file.save(input_path, buffer_size=UPLOAD_COPY_BUFFER_SIZE)
+        logger.info("Saved input file: %s (%d bytes)", input_path, file_size)
+
+        # Hash the upload once; the digest is reused for the cache lookup and the cache store
+        file_hash = calculate_file_hash(input_path)
+        cached_path = get_cached_fn(file_hash, output_format)
+        if cached_path:
+            try:
+                response = send_file(
+                    cached_path,
+                    as_attachment=True,
+                    download_name=output_filename,
+                    mimetype=supported_formats[output_format][0],
+                )
+            except FileNotFoundError:
+                # Swept from the cache directory since it was cached; convert it again
+                logger.info("Cached conversion result is gone: %s", cached_path)
+            else:
+                logger.info("Using cached conversion result")
+                cleanup_fn(temp_dir)
+                return response
+
         output_path = os.path.join(temp_dir, output_filename)
         logger.info(f"Will save converted file to: {output_path}")
 
-        success, error = clear_scene_fn()
-        if not success:
-            logger.error(f"Failed to clear scene before conversion: {error}")
-            cleanup_fn(temp_dir)
-            return jsonify({"error": error}), 500
-
+        # convert_func resets the scene itself (convert_file -> clear_scene), so no reset here
         success, message = convert_func(input_path, output_path, input_format, output_format)
 
         if not success:
@@ -406,35 +722,38 @@ def process_conversion(
 
         logger.info(f"Conversion successful: {input_format} -> {output_format}")
 
-        cache_result_fn(input_path, output_path, output_format)
+        cache_result_fn(file_hash, output_path, output_format)
 
         try:
-            if not os.path.exists(output_path):
+            try:
+                file_size = os.stat(output_path).st_size
+            except FileNotFoundError:
                 logger.error(f"Output file does not exist at {output_path}")
+                cleanup_fn(temp_dir)
                 return jsonify({"error": "Converted file not found"}), 500
 
-            file_size = os.path.getsize(output_path)
-            logger.info(f"Sending file {output_path} (size: {file_size} bytes)")
+            logger.info("Sending file %s (size: %d bytes)", output_path, file_size)
 
             try:
-                with open(output_path, "rb") as f:
-                    file_data = f.read()
-
-                logger.info(f"File {output_path} read into memory (size: {len(file_data)} bytes)")
-                cleanup_fn(temp_dir)
-                logger.info("Temporary files cleaned up")
-
-                return send_file(
-                    io.BytesIO(file_data),
+                # Stream from disk (wsgi.file_wrapper/sendfile where supported) instead of buffering in memory
+                response = send_file(
+                    output_path,
                     as_attachment=True,
-                    download_name=secure_filename(f"converted.{output_format}"),
+                    download_name=output_filename,
                     mimetype=supported_formats[output_format][0],
                     max_age=0,
                 )
             except IOError as exc:
                 logger.error(f"Error reading output file: {exc}")
+                cleanup_fn(temp_dir)
                 return jsonify({"error": "Error reading converted file"}), 500
 
+            # send_file has already opened the output, so the body stays readable after the
+            # directory is unlinked (close hooks do not run for direct-passthrough responses)
+            cleanup_fn(temp_dir)
+            logger.info("Temporary files cleaned up")
+            return response
+
         except Exception as exc:
             logger.error(f"Error sending file: {exc}")
             cleanup_fn(temp_dir)
@@ -1,5 +1,7 @@
+import io
 import unittest
 import os
+import shutil
 import tempfile
 from unittest.mock import patch, Mock
 import sys
@@ -26,19 +28,19 @@ def _export_side_effect(filepath, *args, **kwargs):
         f.write("mock data")
 
 mock_bpy.data.objects = _bpy_objects
-mock_bpy.ops.import_scene.fbx.side_effect = _add_obj_side_effect
-mock_bpy.ops.import_scene.obj.side_effect = _add_obj_side_effect
-mock_bpy.ops.import_scene.gltf.side_effect = _add_obj_side_effect
-mock_bpy.ops.import_scene.vrm.side_effect = _add_obj_side_effect
-mock_bpy.ops.import_anim.bvh.side_effect = _add_obj_side_effect
+mock_bpy.context.preferences.addons.keys.return_value = ["io_scene_fbx", "io_scene_gltf2"]
+# The operators app.blender.io dispatches to: (import group, export group, name)
+for _import_group, _export_group, _name in (
+    ("import_scene", "export_scene", "fbx"),
+    ("import_scene", "export_scene", "obj"),
+    ("import_scene", "export_scene", "gltf"),
+    ("import_scene", "export_scene", "vrm"),
+    ("import_anim", "export_anim", "bvh"),
+):
+    getattr(getattr(mock_bpy.ops, _import_group), _name).side_effect = _add_obj_side_effect
+    getattr(getattr(mock_bpy.ops, _export_group), _name).side_effect = _export_side_effect
 mock_bpy.ops.object.delete.side_effect = _clear_obj_side_effect
 
-mock_bpy.ops.export_scene.fbx.side_effect = _export_side_effect
-mock_bpy.ops.export_scene.obj.side_effect = _export_side_effect
-mock_bpy.ops.export_scene.gltf.side_effect = _export_side_effect
-mock_bpy.ops.export_scene.vrm.side_effect = _export_side_effect
-mock_bpy.ops.export_anim.bvh.side_effect = _export_side_effect
-
 mock_bpy.data.meshes = []
 mock_bpy.data.materials = []
 mock_bpy.data.textures = []
@@ -50,10 +52,6 @@ sys.modules['bpy'] = mock_bpy
 
 mock_vrm_addon = types.ModuleType("io_scene_vrm")
 mock_vrm_addon.register = Mock()
-# Add spec to the mock module to satisfy importlib.reload
-spec = Mock()
-spec.name = "io_scene_vrm"
-mock_vrm_addon.__spec__ = spec
 sys.modules['io_scene_vrm'] = mock_vrm_addon
 
 # Mock redis client and its methods
@@ -61,13 +59,22 @@ class MockRedisError(Exception):
     pass
 mock_redis_client = Mock()
 mock_pipeline = Mock()
-mock_pipeline.execute.return_value = (None, 0, None, None)
+mock_pipeline.execute.return_value = (1, True)
 mock_redis_client.pipeline.return_value = mock_pipeline
 mock_redis_client.Redis.return_value = mock_redis_client
 mock_redis_client.RedisError = MockRedisError
 mock_redis_client.get.return_value = None
 sys.modules['redis'] = mock_redis_client
 
+# Uploads are posted from memory rather than written to temporary files first
+_PAYLOAD = b'data'
+
+
+def _upload(filename, content=_PAYLOAD):
+    """multipart の file フィールドに渡す (BytesIO, ファイル名) を返す。"""
+    return (io.BytesIO(content), filename)
+
+
 if flask:
     from app.convert import app
 else:
@@ -78,20 +85,28 @@ import time
 class TestFileConversion(unittest.TestCase):
     """ファイル変換APIの入力検証・正常系・異常系を網羅するテスト群。"""
 
+    @classmethod
+    def setUpClass(cls):
+        """Flaskテストクライアントをクラスで1回だけ準備する。"""
+        env_patch = patch.dict(os.environ, {"APP_ENV": "local"})
+        env_patch.start()
+        cls.addClassCleanup(env_patch.stop)
+        cls.client = app.test_client()
+        cls.client.testing = True
+
     def setUp(self):
-        """モックの初期化とFlaskテストクライアントの準備を行う。"""
+        """テストごとに変更されるモックの状態だけを初期化する。"""
         # Reset mocks for test isolation
         mock_pipeline.execute.side_effect = None
-        mock_pipeline.execute.return_value = (None, 0, None, None)
+        mock_pipeline.execute.return_value = (1, True)
+        mock_redis_client.get.side_effect = None
+        mock_redis_client.get.return_value = None
         _bpy_objects.clear()
-        mock_bpy.data.actions = []
+        mock_bpy.data.actions.clear()
+        from app.services import conversion_service
+        conversion_service._local_cache.clear()
+        self.app = self.client
 
-        os.makedirs('/tmp/convert', exist_ok=True)
-        with patch.dict(os.environ, {"APP_ENV": "local"}):
-            from app.convert import app
-            self.app = app.test_client()
-            self.app.testing = True
-        
     def test_health_check(self):
         """ヘルスチェックが200とhealthyを返すことを確認する。"""
         response = self.app.get('/health')
@@ -106,51 +121,45 @@ class TestFileConversion(unittest.TestCase):
 
     def test_invalid_file_format(self):
         """未対応拡張子で400となることを確認する。"""
-        temp = tempfile.NamedTemporaryFile(suffix='.txt')
-        temp.write(b'data')
-        temp.seek(0)
-        data = {
-            'file': (temp, 'test.txt')
-        }
+        data = {'file': _upload('test.txt')}
         response = self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data')
         self.assertEqual(response.status_code, 400)
         self.assertTrue('error' in response.json)
 
+    def test_unsupported_output_format_skips_upload_parsing(self):
+        """未対応の出力形式はアップロード本体を解析する前に400となることを確認する。"""
+        data = {'file': _upload('test.fbx')}
+        with patch('flask.Request._load_form_data') as mock_parse:
+            response = self.app.post('/convert?output_format=xyz', data=data, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['error'], 'Unsupported output format: xyz')
+        mock_parse.assert_not_called()
+
     def test_empty_file(self):
         """空ファイルで400となることを確認する。"""
-        with tempfile.NamedTemporaryFile(suffix='.fbx') as temp_file:
-            data = {
-                'file': (temp_file, 'empty.fbx')
-            }
-            response = self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data')
-            self.assertEqual(response.status_code, 400)
-            self.assertTrue('error' in response.json)
+        data = {'file': _upload('empty.fbx', b'')}
+        response = self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue('error' in response.json)
 
     def test_large_file(self):
         """上限超過ファイルで413となることを確認する。"""
-        # Create a large temporary file (100MB)
-        with tempfile.NamedTemporaryFile(suffix='.fbx') as temp_file:
-            temp_file.write(b'0' * 100 * 1024 * 1024)
-            temp_file.seek(0)
-            data = {
-                'file': (temp_file, 'large.fbx')
-            }
-            response = self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data')
-            self.assertEqual(response.status_code, 413)
-            self.assertTrue('error' in response.json)
+        # Shrink the limits instead of uploading a real oversize body
+        for name, limit in (("request body", patch.dict(app.config, {"MAX_CONTENT_LENGTH": 16})),
+                            ("file size", patch('app.convert.MAX_FILE_SIZE', 16))):
+            with self.subTest(limit=name), limit:
+                data = {'file': _upload('large.fbx', b'0' * 32)}
+                response = self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data')
+                self.assertEqual(response.status_code, 413)
+                self.assertTrue('error' in response.json)
 
     @patch('app.convert.import_file', return_value=(False, "Import error"))
     def test_malformed_file(self, mock_import):
         """インポート失敗時に500が返ることを確認する。"""
-        with tempfile.NamedTemporaryFile(suffix='.fbx') as temp_file:
-            temp_file.write(b'malformed content')
-            temp_file.seek(0)
-            data = {
-                'file': (temp_file, 'malformed.fbx')
-            }
-            response = self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data')
-            self.assertEqual(response.status_code, 500)
-            self.assertTrue('error' in response.json)
+        data = {'file': _upload('malformed.fbx', b'malformed content')}
+        response = self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 500)
+        self.assertTrue('error' in response.json)
 
     @patch('app.convert.convert_file_with_timeout')
     def test_successful_conversion(self, mock_convert):
@@ -162,16 +171,51 @@ class TestFileConversion(unittest.TestCase):
             return (True, "Conversion successful")
         mock_convert.side_effect = side_effect
         
-        # Create a temporary FBX file
-        with tempfile.NamedTemporaryFile(suffix='.fbx') as temp_file:
-            temp_file.write(b'data')
-            temp_file.seek(0)
-            data = {
-                'file': (temp_file, 'test.fbx')
-            }
+        data = {'file': _upload('test.fbx')}
+        temp_dir = tempfile.mkdtemp()
+        # Removed even when the handler under test fails to clean up
+        self.addCleanup(shutil.rmtree, temp_dir, ignore_errors=True)
+        with patch('tempfile.mkdtemp', return_value=temp_dir):
             response = self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data')
-            self.assertEqual(response.status_code, 200)
+        self.assertFalse(os.path.exists(temp_dir))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, b"mock data")
+
+
+    @patch('app.convert.convert_file_with_timeout')
+    def test_missing_cached_file_is_converted_again(self, mock_convert):
+        """キャッシュに登録されたファイルが消えている場合、変換し直して200が返ることを確認する。"""
+        def side_effect(input_path, output_path, input_format, output_format):
+            with open(output_path, "w") as f:
+                f.write("mock data")
+            return (True, "Conversion successful")
+        mock_convert.side_effect = side_effect
+        mock_redis_client.get.return_value = '/nonexistent/convert_cache/gone.glb'
 
+        data = {'file': _upload('test.fbx')}
+        response = self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, b"mock data")
+        mock_convert.assert_called_once()
+
+    @patch('app.convert.convert_file_with_timeout')
+    def test_same_format_is_returned_unchanged(self, mock_convert):
+        """入力と出力の形式が同じ場合、変換せずにアップロード内容を返すことを確認する。"""
+        content = b'glTF\x02\x00\x00\x00payload'
+        data = {'file': (io.BytesIO(content), 'model.glb')}
+        response = self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, content)
+        self.assertIn('converted.glb', response.headers['Content-Disposition'])
+        mock_convert.assert_not_called()
+
+    def test_same_format_counts_against_rate_limit(self):
+        """形式が同じアップロードの返却もレートリミットの対象になることを確認する。"""
+        from app.config import get_settings
+        mock_pipeline.execute.return_value = (get_settings().rate_limit_requests + 1, True)
+        data = {'file': (io.BytesIO(b'glTF\x02\x00\x00\x00payload'), 'model.glb')}
+        response = self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 429)
 
     @patch('app.convert.convert_file_with_timeout')
     def test_conversion_error(self, mock_convert):
@@ -179,42 +223,30 @@ class TestFileConversion(unittest.TestCase):
         # Mock conversion error
         mock_convert.return_value = (False, "Error during conversion")
 
-        with tempfile.NamedTemporaryFile(suffix='.fbx') as temp_file:
-            temp_file.write(b'data')
-            temp_file.seek(0)
-            data = {
-                'file': (temp_file, 'test.fbx')
-            }
-            response = self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data')
-            self.assertEqual(response.status_code, 500)
-            self.assertEqual(response.json['error'], "Error during conversion")
+        data = {'file': _upload('test.fbx')}
+        response = self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json['error'], "Error during conversion")
 
     def test_rate_limit(self):
         """レートリミットが適用されることを確認する。"""
         from app.config import get_settings
         settings = get_settings()
 
-        counts = list(range(settings.rate_limit_requests + 5))
-
-        def mock_execute(*args, **kwargs):
-            return (None, counts.pop(0), None, None)
-
-        mock_pipeline.execute.side_effect = mock_execute
+        # A list side_effect is consumed through an iterator, one result per call
+        mock_pipeline.execute.side_effect = [
+            (count, True) for count in range(1, settings.rate_limit_requests + 6)
+        ]
 
-        # Test rate limiting by making multiple requests
-        responses = []
-        for _ in range(settings.rate_limit_requests + 5):
-            with tempfile.NamedTemporaryFile(suffix='.fbx') as temp_file:
-                temp_file.write(b'data')
-                temp_file.seek(0)
-                data = {
-                    'file': (temp_file, 'test.fbx')
-                }
-                responses.append(self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data'))
-        
-        # Check if any requests were rate limited
-        rate_limited = any(r.status_code == 429 for r in responses)
-        self.assertTrue(rate_limited)
+        # Stop at the first rejected request instead of posting the remaining ones
+        for _attempt in range(1, settings.rate_limit_requests + 6):
+            data = {'file': _upload('test.fbx')}
+            response = self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data')
+            if response.status_code == 429:
+                break
+        else:
+            self.fail("rate limit never triggered")
+        self.assertEqual(_attempt, settings.rate_limit_requests + 1)
 
     @patch('app.convert.convert_file_with_timeout')
     def test_timeout_handling(self, mock_convert):
@@ -222,52 +254,28 @@ class TestFileConversion(unittest.TestCase):
         # Mock a timeout during conversion
         mock_convert.return_value = (False, "Conversion timed out")
 
-        with tempfile.NamedTemporaryFile(suffix='.fbx') as temp_file:
-            temp_file.write(b'data')
-            temp_file.seek(0)
-            data = {
-                'file': (temp_file, 'test.fbx')
-            }
+        data = {'file': _upload('test.fbx')}
 
-            response = self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data')
-            self.assertEqual(response.status_code, 500)
-            self.assertTrue('error' in response.json)
-            self.assertEqual(response.json['error'], "Conversion timed out")
+        response = self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 500)
+        self.assertTrue('error' in response.json)
+        self.assertEqual(response.json['error'], "Conversion timed out")
 
     def test_concurrent_requests(self):
         """複数スレッドからの同時リクエストをハンドリングできることを確認する。"""
-        import threading
-        import queue
-        
-        results = queue.Queue()
-        def make_request():
-            with tempfile.NamedTemporaryFile(suffix='.fbx') as temp_file:
-                temp_file.write(b'data')
-                temp_file.seek(0)
-                data = {
-                    'file': (temp_file, 'test.fbx')
-                }
-                response = self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data')
-                results.put(response.status_code)
-
-        # Create multiple threads to simulate concurrent requests
-        threads = []
-        for _ in range(20):
-            t = threading.Thread(target=make_request)
-            threads.append(t)
-            t.start()
+        from concurrent.futures import ThreadPoolExecutor
 
-        # Wait for all threads to complete
-        for t in threads:
-            t.join()
+        def make_request(_):
+            data = {'file': _upload('test.fbx')}
+            response = self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data')
+            return response.status_code
 
-        # Check results
-        status_codes = []
-        while not results.empty():
-            status_codes.append(results.get())
+        # A few threads already overlap uploads with conversions waiting on the Blender lock
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            status_codes = list(executor.map(make_request, range(8)))
 
         # Verify that all requests were handled
-        self.assertEqual(len(status_codes), 20)
+        self.assertEqual(len(status_codes), 8)
         # Some requests might be rate limited (429) or successful (200)
         self.assertTrue(all(code in [200, 429, 500] for code in status_codes))
 
@@ -290,81 +298,534 @@ class TestFileConversion(unittest.TestCase):
         mock_convert.return_value = (False, "Simulated error")
 
         temp_dir = tempfile.mkdtemp()
-        with tempfile.NamedTemporaryFile(suffix='.fbx') as temp_file:
-            temp_file.write(b'data')
-            temp_file.seek(0)
-            data = {
-                'file': (temp_file, 'test.fbx')
-            }
-            with patch('tempfile.mkdtemp', return_value=temp_dir):
-                response = self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data')
+        # Removed even when the handler under test fails to clean up
+        self.addCleanup(shutil.rmtree, temp_dir, ignore_errors=True)
+        data = {'file': _upload('test.fbx')}
+        with patch('tempfile.mkdtemp', return_value=temp_dir):
+            response = self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data')
         
         self.assertEqual(response.status_code, 500)
         self.assertFalse(os.path.exists(temp_dir))
 
 
     def test_all_format_conversions(self):
-        """Test all supported format conversion combinations"""
+        """Test every importer and exporter once"""
+        # Each format appears once as input and once as output, so every import/export branch
+        # runs without posting all 30 combinations
         formats = ['fbx', 'obj', 'gltf', 'glb', 'vrm', 'bvh']
-        
-        for input_format in formats:
-            for output_format in formats:
-                if input_format != output_format:
-                    with self.subTest(f"{input_format} to {output_format}"):
-                        with tempfile.NamedTemporaryFile(suffix=f'.{input_format}') as temp_file:
-                            temp_file.write(b'data')
-                            temp_file.seek(0)
-                            data = {
-                                'file': (temp_file, f'test.{input_format}')
-                            }
-                            endpoint = f'/convert?output_format={output_format}'
-                            response = self.app.post(endpoint, data=data, content_type='multipart/form-data')
-                            self.assertIn(response.status_code, [200, 400, 500])
+        # GLB containers (glb, vrm) must pass the magic-byte check to reach the importer
+        payloads = {'glb': b'glTF\x02\x00\x00\x00data', 'vrm': b'glTF\x02\x00\x00\x00data'}
+
+        for input_format, output_format in zip(formats, formats[1:] + formats[:1], strict=True):
+            with self.subTest(f"{input_format} to {output_format}"):
+                data = {'file': _upload(f'test.{input_format}', payloads.get(input_format, _PAYLOAD))}
+                endpoint = f'/convert?output_format={output_format}'
+                response = self.app.post(endpoint, data=data, content_type='multipart/form-data')
+                self.assertIn(response.status_code, [200, 400, 500])
 
     def test_bvh_conversion_no_animation(self):
         # No animation data in mock_bpy.data.actions, so this should fail
-        with tempfile.NamedTemporaryFile(suffix='.fbx') as temp_file:
-            temp_file.write(b'data')
-            temp_file.seek(0)
-            data = {
-                'file': (temp_file, 'test.fbx')
-            }
-            response = self.app.post('/convert?output_format=bvh', data=data, content_type='multipart/form-data')
-            self.assertEqual(response.status_code, 500)
-            self.assertEqual(response.json['error'], "No animation data found to export to BVH.")
+        data = {'file': _upload('test.fbx')}
+        response = self.app.post('/convert?output_format=bvh', data=data, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json['error'], "No animation data found to export to BVH.")
 
     def test_successful_bvh_conversion(self):
         # Add a mock action to pass the BVH export check
         mock_bpy.data.actions.append(Mock())
 
-        with tempfile.NamedTemporaryFile(suffix='.bvh') as temp_file:
-            temp_file.write(b'data')
-            temp_file.seek(0)
-            data = {
-                'file': (temp_file, 'test.bvh')
-            }
-            response = self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data')
-            self.assertEqual(response.status_code, 200)
+        data = {'file': _upload('test.bvh')}
+        response = self.app.post('/convert?output_format=glb', data=data, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+
+@unittest.skipUnless(flask, "Flask is not installed in the test environment")
+class TestHealthCheck(unittest.TestCase):
+    """ヘルスチェックの Redis 疎通確認が TTL 内で再利用されることを検証するテスト。"""
+
+    def setUp(self):
+        from app import convert
+        self.convert = convert
+        convert._redis_status = (None, "unknown")
+        self.addCleanup(setattr, convert, "_redis_status", (None, "unknown"))
+        mock_redis_client.ping.reset_mock(side_effect=True)
+
+    def test_ping_is_reused_within_ttl(self):
+        """TTL 内の連続したヘルスチェックでは PING を1回しか送らないことを確認する。"""
+        client = self.convert.app.test_client()
+        self.assertEqual(client.get('/health').json['redis'], 'connected')
+        self.assertEqual(client.get('/health').json['redis'], 'connected')
+        mock_redis_client.ping.assert_called_once_with()
+
+    def test_failed_ping_reports_disconnected(self):
+        """PING が失敗した場合は disconnected を返すことを確認する。"""
+        mock_redis_client.ping.side_effect = MockRedisError("down")
+        self.assertEqual(self.convert.redis_health(), "disconnected")
+
 
 @unittest.skipUnless(flask, "Flask is not installed in the test environment")
 class TestIsLocalEnv(unittest.TestCase):
     """is_localの判定を検証するテスト。"""
 
-    def test_is_local_env_true(self):
-        """APP_ENV=localでTrueになることを確認する。"""
-        with patch.dict(os.environ, {"APP_ENV": "local"}):
-            from app.config import get_settings
-            get_settings.cache_clear()
-            settings = get_settings()
-            self.assertTrue(settings.is_local())
-
-    def test_is_local_env_false(self):
-        """APP_ENV=productionでFalseになることを確認する。"""
-        with patch.dict(os.environ, {"APP_ENV": "production"}):
-            from app.config import get_settings
-            get_settings.cache_clear()
-            settings = get_settings()
-            self.assertFalse(settings.is_local())
+    def test_is_local_env(self):
+        """APP_ENV=localのときだけTrueになることを確認する。"""
+        from app.config.settings import AppSettings
+        for app_env, expected in (("local", True), ("production", False)):
+            with self.subTest(app_env=app_env):
+                # Built directly so the process-wide get_settings() cache is left as the other tests use it
+                with patch.dict(os.environ, {"APP_ENV": app_env}):
+                    settings = AppSettings.from_env()
+                self.assertEqual(settings.is_local(), expected)
+
+@unittest.skipUnless(flask, "Flask is not installed in the test environment")
+class TestRateLimit(unittest.TestCase):
+    """レートリミットのカウンタ操作を検証するテスト。"""
+
+    def setUp(self):
+        self.pipe = Mock()
+        self.client = Mock()
+        self.client.pipeline.return_value = self.pipe
+
+    def _check(self):
+        from app.services.conversion_service import check_rate_limit
+        return check_rate_limit(self.client, "127.0.0.1", limit=10, window=60)
+
+    def test_counter_key_is_per_window(self):
+        """カウンタのキーがウィンドウごとに切り替わり、1回の execute で上限ちょうどまでは許可されることを確認する。"""
+        self.pipe.execute.return_value = (10, True)
+        with patch("app.services.conversion_service.time.time", return_value=125.0):
+            self.assertFalse(self._check())
+        self.pipe.execute.assert_called_once_with(raise_on_error=False)
+        self.pipe.incr.assert_called_once_with("rate_limit:127.0.0.0/24:2")
+        self.pipe.expire.assert_called_once_with("rate_limit:127.0.0.0/24:2", 60)
+
+    def test_rate_limited_request(self):
+        """上限を超えたリクエストが拒否されることを確認する。"""
+        self.pipe.execute.return_value = (11, True)
+        self.assertTrue(self._check())
+
+    def test_clients_share_counter_by_network(self):
+        """IPv4は/24、IPv6は/64単位で同じカウンタを使うことを確認する。"""
+        from app.services.conversion_service import rate_limit_network
+        self.assertEqual(rate_limit_network("203.0.113.7"), "203.0.113.0/24")
+        self.assertEqual(rate_limit_network("2001:db8::1:2:3:4"), "2001:db8::/64")
+        self.assertEqual(rate_limit_network("unix-socket"), "unix-socket")
+
+    def test_rejected_counter_allows_request(self):
+        """INCR がエラーを返した場合はレートリミットなしとして扱うことを確認する。"""
+        self.pipe.execute.return_value = (MockRedisError("OOM"), MockRedisError("OOM"))
+        self.assertFalse(self._check())
+
+    def test_redis_failure_allows_request(self):
+        """Redis 障害時はレートリミットなしとして扱うことを確認する。"""
+        self.pipe.execute.side_effect = MockRedisError("down")
+        self.assertFalse(self._check())
+
+    def test_rejected_upload_is_not_parsed(self):
+        """上限を超えたクライアントのアップロードは解析せずに429を返すことを確認する。"""
+        mock_pipeline.execute.side_effect = None
+        mock_pipeline.execute.return_value = (11, True)
+        self.addCleanup(setattr, mock_pipeline.execute, "return_value", (1, True))
+        data = {'file': _upload('test.txt')}
+        with patch('flask.Request._load_form_data') as mock_parse:
+            response = app.test_client().post(
+                '/convert?output_format=glb', data=data, content_type='multipart/form-data'
+            )
+        self.assertEqual(response.status_code, 429)
+        mock_parse.assert_not_called()
+
+
+@unittest.skipUnless(flask, "Flask is not installed in the test environment")
+class TestLookupCachedConversion(unittest.TestCase):
+    """キャッシュ済み変換結果の参照を検証するテスト。"""
+
+    def setUp(self):
+        from app.services import conversion_service
+        conversion_service._local_cache.clear()
+        self.addCleanup(conversion_service._local_cache.clear)
+        self.client = Mock()
+        with tempfile.NamedTemporaryFile(suffix='.glb', delete=False) as f:
+            f.write(b'data')
+        self.cached_path = f.name
+        self.addCleanup(os.remove, self.cached_path)
+
+    def _lookup(self):
+        from app.services.conversion_service import lookup_cached_conversion
+        return lookup_cached_conversion(self.client, "abc123", "glb")
+
+    def test_cached_path_is_returned(self):
+        """Redis に登録されたパスが返ることを確認する。"""
+        from app.services.conversion_service import conversion_cache_key
+        self.client.get.return_value = self.cached_path
+        self.assertEqual(self._lookup(), self.cached_path)
+        self.client.get.assert_called_once_with(conversion_cache_key("abc123", "glb"))
+
+    def test_local_cache_hit_skips_redis_get(self):
+        """プロセス内LRUにあるキーは Redis に GET を送らないことを確認する。"""
+        from app.services.conversion_service import _local_cache_put, conversion_cache_key
+        _local_cache_put(conversion_cache_key("abc123", "glb"), self.cached_path, 60)
+        self.assertEqual(self._lookup(), self.cached_path)
+        self.client.get.assert_not_called()
+
+    def test_local_cache_evicts_least_recently_used(self):
+        """上限を超えると最も古いエントリから破棄されることを確認する。"""
+        from app.services import conversion_service
+        with patch.object(conversion_service, "LOCAL_CACHE_SIZE", 2):
+            for key in ("a", "b", "c"):
+                conversion_service._local_cache_put(key, self.cached_path, 60)
+        self.assertIsNone(conversion_service._local_cache_get("a"))
+        self.assertEqual(conversion_service._local_cache_get("c"), self.cached_path)
+
+    def test_redis_failure_is_a_miss(self):
+        """Redis 障害時はキャッシュなしとして扱うことを確認する。"""
+        self.client.get.side_effect = MockRedisError("down")
+        self.assertIsNone(self._lookup())
+
+
+@unittest.skipUnless(flask, "Flask is not installed in the test environment")
+class TestValidateFileFormat(unittest.TestCase):
+    """拡張子とMIMEタイプの検証を確認するテスト。"""
+
+    def test_matches_per_call_mimetypes_lookup(self):
+        """事前計算したテーブルが都度の mimetypes 判定と同じ結果になることを確認する。"""
+        import mimetypes
+        from app.services.conversion_service import SUPPORTED_FORMATS, validate_file_format
+        for fmt, mimes in SUPPORTED_FORMATS.items():
+            for filename in (f"model.{fmt}", f"MODEL.{fmt.upper()}", "model.txt"):
+                with self.subTest(fmt=fmt, filename=filename):
+                    guessed = mimetypes.guess_type(filename)[0]
+                    if not filename.lower().endswith(f".{fmt}"):
+                        expected = False
+                    else:
+                        expected = not guessed or guessed in mimes
+                    self.assertEqual(validate_file_format(Mock(filename=filename), fmt)[0], expected)
+
+
+@unittest.skipUnless(flask, "Flask is not installed in the test environment")
+class TestValidateFileContent(unittest.TestCase):
+    """先頭バイトによる入力内容の検証を確認するテスト。"""
+
+    def test_magic_bytes_must_match_declared_format(self):
+        """バイナリ形式は先頭バイトが一致する場合のみ受け付けることを確認する。"""
+        from app.services.conversion_service import validate_file_content
+        glb = b"glTF\x02\x00\x00\x00"
+        fbx = b"Kaydara FBX Binary  \x00"
+        cases = [
+            (glb, "glb", True),
+            (glb, "vrm", True),
+            (b"data", "glb", False),
+            (fbx, "fbx", True),
+            (b"; FBX 7.4.0 project file", "fbx", True),
+            (glb, "fbx", False),
+            (fbx, "obj", False),
+            (b"HIERARCHY", "bvh", True),
+        ]
+        for content, fmt, expected in cases:
+            with self.subTest(fmt=fmt, content=content):
+                self.assertEqual(validate_file_content(content, fmt)[0], expected)
+
+
+@unittest.skipUnless(flask, "Flask is not installed in the test environment")
+class TestContentHash(unittest.TestCase):
+    """アップロード内容のハッシュ計算を検証するテスト。"""
+
+    def test_sha256_fallback_hashes_mapped_file(self):
+        """blake3 が無い環境では mmap した内容の SHA-256 を返し、空ファイルも扱えることを確認する。"""
+        import hashlib
+        from app.services import conversion_service
+        for content in (b'data' * 4096, b''):
+            with self.subTest(size=len(content)):
+                with tempfile.NamedTemporaryFile(delete=False) as f:
+                    f.write(content)
+                self.addCleanup(os.remove, f.name)
+                with patch.object(conversion_service, "blake3", None):
+                    digest = conversion_service.calculate_file_hash(f.name)
+                self.assertEqual(digest, hashlib.sha256(content).hexdigest())
+
+
+@unittest.skipUnless(flask, "Flask is not installed in the test environment")
+class TestCacheConversionResult(unittest.TestCase):
+    """変換結果の永続キャッシュへの登録を検証するテスト。"""
+
+    def setUp(self):
+        from app.services import conversion_service
+        self.service = conversion_service
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        patcher = patch.object(conversion_service, "PERSISTENT_CACHE_DIR", self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(b"converted" * 1024)
+        self.output_path = f.name
+        self.addCleanup(os.remove, f.name)
+
+    def test_result_is_cached_and_registered(self):
+        """キャッシュディレクトリへ同じ内容が書かれ、そのパスが Redis に登録されることを確認する。"""
+        redis_client = Mock()
+        self.service.cache_conversion_result(redis_client, "cafe", self.output_path, "glb", 60)
+
+        cached_path = os.path.join(self.cache_dir, "cafe.glb")
+        with open(cached_path, "rb") as f:
+            self.assertEqual(f.read(), b"converted" * 1024)
+        redis_client.setex.assert_called_once_with(
+            self.service.conversion_cache_key("cafe", "glb"), 60, cached_path
+        )
+
+    def test_same_filesystem_result_is_hard_linked(self):
+        """同じファイルシステム上では変換結果と同じ inode を共有し、既存エントリも置き換えることを確認する。"""
+        cached_path = os.path.join(self.cache_dir, "cafe.glb")
+        with open(cached_path, "wb") as f:
+            f.write(b"stale")
+        self.service.cache_conversion_result(Mock(), "cafe", self.output_path, "glb", 60)
+
+        self.assertTrue(os.path.samefile(cached_path, self.output_path))
+        self.assertEqual(os.listdir(self.cache_dir), ["cafe.glb"])
+
+    def test_failed_replace_leaves_no_staging_link(self):
+        """リンクの置き換えに失敗した場合、一時リンクを残さず Redis にも登録しないことを確認する。"""
+        redis_client = Mock()
+        with patch.object(self.service.os, "replace", side_effect=OSError):
+            self.service.cache_conversion_result(redis_client, "cafe", self.output_path, "glb", 60)
+
+        self.assertEqual(os.listdir(self.cache_dir), [])
+        redis_client.setex.assert_not_called()
+
+    def test_falls_back_to_copy_without_copy_file_range(self):
+        """リンクも copy_file_range も使えない場合は通常のコピーで同じ内容になることを確認する。"""
+        with patch.object(self.service.os, "link", side_effect=OSError), \
+                patch.object(self.service.os, "copy_file_range", side_effect=OSError, create=True):
+            self.service.cache_conversion_result(Mock(), "beef", self.output_path, "fbx", 60)
+
+        with open(os.path.join(self.cache_dir, "beef.fbx"), "rb") as f:
+            self.assertEqual(f.read(), b"converted" * 1024)
+
+
+@unittest.skipUnless(flask, "Flask is not installed in the test environment")
+class TestRemoveStaleEntries(unittest.TestCase):
+    """古い作業ディレクトリ・キャッシュファイルの定期削除を検証するテスト。"""
+
+    def test_only_old_entries_with_prefix_are_removed(self):
+        """接頭辞が一致し、指定秒数より古いエントリだけが削除されることを確認する。"""
+        from app.services.conversion_service import remove_stale_entries
+        with tempfile.TemporaryDirectory() as root:
+            old_dir = os.path.join(root, "convert_req_old")
+            new_dir = os.path.join(root, "convert_req_new")
+            other = os.path.join(root, "convert_cache")
+            for path in (old_dir, new_dir, other):
+                os.makedirs(path)
+            with open(os.path.join(old_dir, "input.fbx"), "wb") as f:
+                f.write(b"data")
+            past = time.time() - 3600
+            os.utime(old_dir, (past, past))
+            os.utime(other, (past, past))
+
+            self.assertEqual(remove_stale_entries(root, 60, prefix="convert_req_"), 1)
+            self.assertEqual(sorted(os.listdir(root)), ["convert_cache", "convert_req_new"])
+
+    def test_missing_directory_is_ignored(self):
+        """存在しないディレクトリでは何もせず0を返すことを確認する。"""
+        from app.services.conversion_service import remove_stale_entries
+        self.assertEqual(remove_stale_entries("/nonexistent/convert", 60), 0)
+
+
+@unittest.skipUnless(flask, "Flask is not installed in the test environment")
+class TestConvertFileGc(unittest.TestCase):
+    """APIプロセス内の変換がGCの状態を変えないことを検証するテスト。"""
+
+    def test_gc_stays_enabled_during_conversion(self):
+        """スレッドモードのAPIプロセスでは、変換中もGCが有効なままであることを確認する。"""
+        import gc
+        from app.services.conversion_service import convert_file
+        states = []
+
+        def importer(path, fmt):
+            states.append(gc.isenabled())
+            return False, "stop"
+
+        with tempfile.NamedTemporaryFile(suffix='.fbx') as f:
+            f.write(b'data')
+            f.flush()
+            result = convert_file(
+                f.name, f.name + ".glb", "fbx", "glb",
+                importer=importer,
+                clear_scene_fn=lambda: (True, None),
+                setup_addons_fn=lambda: (True, None),
+            )
+
+        self.assertEqual(result, (False, "stop"))
+        self.assertEqual(states, [True])
+        self.assertTrue(gc.isenabled())
+
+
+@unittest.skipUnless(flask, "Flask is not installed in the test environment")
+class TestRunConversionWithTimeout(unittest.TestCase):
+    """変換タイムアウトの挙動を検証するテスト。"""
+
+    def test_timeout_returns_without_waiting_for_conversion(self):
+        """タイムアウト時は変換の完了を待たずに戻ることを確認する。"""
+        from app.services.conversion_service import run_conversion_with_timeout
+        started = time.monotonic()
+        result = run_conversion_with_timeout(lambda: time.sleep(1) or (True, "done"), 0.05)
+        self.assertEqual(result, (False, "Conversion timed out"))
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_conversion_timed_out_waiting_for_lock_is_dropped(self):
+        """ロック待ちのままタイムアウトした変換は、ロック解放後も実行されないことを確認する。"""
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+        from app.services import conversion_service
+        executor = ThreadPoolExecutor(max_workers=1)
+        lock = threading.Lock()
+        convert_func = Mock(return_value=(True, "done"))
+        with patch.object(conversion_service, "_CONVERSION_EXECUTOR", executor), lock:
+            result = conversion_service.run_conversion_with_timeout(convert_func, 0.05, lock=lock)
+        executor.shutdown(wait=True)
+        self.assertEqual(result, (False, "Conversion timed out"))
+        convert_func.assert_not_called()
+
+
+class TestSetupVrmAddon(unittest.TestCase):
+    """VRMアドオンの登録がプロセス内で1回に抑えられることを検証するテスト。"""
+
+    def setUp(self):
+        from app.blender import setup as setup_module
+        self.setup_module = setup_module
+        setup_module._VRM_READY = False
+        mock_vrm_addon.register.reset_mock()
+
+    def test_registers_addon_only_once(self):
+        """2回目以降の呼び出しでは再登録しないことを確認する。"""
+        self.assertEqual(self.setup_module.setup_vrm_addon(), (True, None))
+        self.assertEqual(self.setup_module.setup_vrm_addon(), (True, None))
+        mock_vrm_addon.register.assert_called_once()
+
+class TestSetupAddons(unittest.TestCase):
+    """必須アドオンの有効化が1回だけ行われることを検証するテスト。"""
+
+    def setUp(self):
+        from app.blender import setup as blender_setup
+        blender_setup._ENABLED_ADDONS.clear()
+        self.addCleanup(blender_setup._ENABLED_ADDONS.clear)
+        mock_bpy.ops.preferences.addon_enable.reset_mock()
+
+    def test_missing_addon_is_enabled_once(self):
+        """未有効のアドオンだけを有効化し、2回目以降は bpy.ops に触れないことを確認する。"""
+        from app.blender.setup import setup_addons
+        with patch.object(mock_bpy.context.preferences.addons, "keys", return_value=["io_scene_fbx"]):
+            self.assertEqual(setup_addons(), (True, None))
+            self.assertEqual(setup_addons(), (True, None))
+
+        mock_bpy.ops.preferences.addon_enable.assert_called_once_with(module="io_scene_gltf2")
+
+    def test_ready_addons_skip_preferences_lookup(self):
+        """必須アドオンが揃った後はユーザー設定を参照せずに成功を返すことを確認する。"""
+        from app.blender import setup as blender_setup
+        blender_setup._ENABLED_ADDONS.update(blender_setup._REQUIRED_ADDONS)
+        with patch.object(mock_bpy.context.preferences.addons, "keys") as keys:
+            self.assertEqual(blender_setup.setup_addons(), (True, None))
+
+        keys.assert_not_called()
+        mock_bpy.ops.preferences.addon_enable.assert_not_called()
+
+
+class TestHandleBlenderError(unittest.TestCase):
+    """未処理例外のログ出力を検証するテスト。"""
+
+    def test_traceback_is_logged_as_single_record(self):
+        """トレースバックが1件のログレコードにまとめて添付されることを確認する。"""
+        from app.blender import setup as blender_setup
+        try:
+            raise RuntimeError("boom")
+        except RuntimeError as exc:
+            error = exc
+        with self.assertLogs(blender_setup.logger, level="ERROR") as logs, self.assertRaises(RuntimeError):
+            blender_setup.handle_blender_error(RuntimeError, error, error.__traceback__)
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertIs(logs.records[0].exc_info[1], error)
+
+
+class TestClearScene(unittest.TestCase):
+    """シーン初期化時のデータブロック削除を検証するテスト。"""
+
+    def setUp(self):
+        mock_bpy.data.batch_remove.reset_mock()
+        self.addCleanup(mock_bpy.data.meshes.clear)
+        self.addCleanup(mock_bpy.data.materials.clear)
+
+    def test_clear_scene_removes_datablocks_in_one_batch(self):
+        """全コレクションのIDが1回のbatch_removeで削除されることを確認する。"""
+        from app.blender import clear_scene
+        mesh, material = Mock(), Mock()
+        mock_bpy.data.meshes.append(mesh)
+        mock_bpy.data.materials.append(material)
+
+        self.assertEqual(clear_scene(), (True, None))
+        mock_bpy.data.batch_remove.assert_called_once_with(ids=[mesh, material])
+
+class TestConversionPool(unittest.TestCase):
+    """常駐ワーカープールへのジョブ振り分けと再起動を検証するテスト。"""
+
+    # Prints a banner to stdout first, as blender --background does before running the script
+    FAKE_WORKER = (
+        "import json, os, sys, time\n"
+        "print('Blender 4.2.0 (hash abc123 built 2024-07-16)', flush=True)\n"
+        "replies = os.fdopen(int(os.environ['CONVERSION_WORKER_REPLY_FD']), 'w', buffering=1)\n"
+        "for line in sys.stdin:\n"
+        "    job = json.loads(line)\n"
+        "    if job['input_format'] == 'slow':\n"
+        "        time.sleep(5)\n"
+        "    print(json.dumps({'success': True, 'message': job['output_path']}), file=replies)\n"
+    )
+
+    def setUp(self):
+        from app.blender.pool import ConversionPool
+        self.pool = ConversionPool(1, 1, command=(sys.executable, "-c", self.FAKE_WORKER))
+        self.addCleanup(self.pool.close)
+
+    def test_convert_returns_worker_result(self):
+        """ワーカーの応答が (成功可否, メッセージ) として返ることを確認する。"""
+        self.assertEqual(self.pool.convert("in.fbx", "out.glb", "fbx", "glb"), (True, "out.glb"))
+        self.assertEqual(self.pool.convert("in.fbx", "out2.glb", "fbx", "glb"), (True, "out2.glb"))
+
+    def test_timed_out_worker_is_replaced(self):
+        """タイムアウトしたワーカーが再起動され、次のジョブを処理できることを確認する。"""
+        self.assertEqual(self.pool.convert("in", "out", "slow", "glb"), (False, "Conversion timed out"))
+        self.assertEqual(self.pool.convert("in.fbx", "out.glb", "fbx", "glb"), (True, "out.glb"))
+
+    def test_banner_on_stdout_is_not_read_as_a_reply(self):
+        """起動バナーを標準出力へ書くワーカーでも、最初のジョブの応答を正しく受け取れることを確認する。"""
+        self.assertEqual(self.pool.convert("in.fbx", "first.glb", "fbx", "glb"), (True, "first.glb"))
+
+    def test_wait_for_a_free_worker_counts_against_timeout(self):
+        """空きワーカーを待つ時間もタイムアウトに含まれることを確認する。"""
+        worker = self.pool._idle.get()
+        self.addCleanup(self.pool._idle.put, worker)
+        started = time.monotonic()
+        self.assertEqual(self.pool.convert("in.fbx", "out.glb", "fbx", "glb"), (False, "Conversion timed out"))
+        self.assertLess(time.monotonic() - started, 3)
+
+
+class TestBlenderIO(unittest.TestCase):
+    """フォーマット別のインポート/エクスポート振り分けを検証するテスト。"""
+
+    def test_unsupported_formats_are_rejected(self):
+        """未対応形式はBlenderを操作せずに失敗を返すことを確認する。"""
+        from app.blender.io import export_file, import_file
+        mock_bpy.ops.wm.read_factory_settings.reset_mock()
+
+        self.assertEqual(import_file("model.abc", "abc"), (False, "Unsupported input format: abc"))
+        self.assertEqual(export_file("model.abc", "abc"), (False, "Unsupported output format: abc"))
+        mock_bpy.ops.wm.read_factory_settings.assert_not_called()
+
+    def test_glb_export_is_quantized(self):
+        """GLB出力に gltfpack の量子化が適用されることを確認する。"""
+        from app.blender import io as blender_io
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_path = os.path.join(temp_dir, "model.glb")
+            with patch.object(blender_io, "pack_glb") as mock_pack:
+                self.assertEqual(blender_io.export_file(output_path, "glb"), (True, None))
+        mock_pack.assert_called_once_with(output_path, output_path, blender_io.QUANTIZE_ARGS)
 
 if __name__ == '__main__':
     unittest.main()
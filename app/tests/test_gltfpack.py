@@ -0,0 +1,65 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from app.utils import gltfpack
+
+
+class TestPackGlb(unittest.TestCase):
+    """gltfpack による後処理とフォールバックを確認するテスト。"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, ignore_errors=True)
+        self.src = os.path.join(self.temp_dir, "in.glb")
+        self.dst = os.path.join(self.temp_dir, "out.vrm")
+        with open(self.src, "wb") as f:
+            f.write(b"glTF")
+
+    @patch.object(gltfpack, "GLTFPACK_BIN", None)
+    def test_missing_binary_returns_false(self):
+        """gltfpack が無い場合は何もせずFalseを返すことを検証する。"""
+        self.assertFalse(gltfpack.pack_glb(self.src, self.dst, gltfpack.QUANTIZE_ARGS))
+        self.assertFalse(os.path.exists(self.dst))
+
+    @patch.object(gltfpack, "GLTFPACK_BIN", "/usr/bin/gltfpack")
+    def test_success_replaces_destination(self):
+        """gltfpack の出力が出力先へ移動されることを検証する。"""
+        def fake_run(cmd, **kwargs):
+            with open(cmd[cmd.index("-o") + 1], "wb") as f:
+                f.write(b"packed")
+
+        with patch.object(gltfpack.subprocess, "run", side_effect=fake_run) as mock_run:
+            self.assertTrue(gltfpack.pack_glb(self.src, self.dst, gltfpack.QUANTIZE_ARGS))
+
+        self.assertEqual(tuple(mock_run.call_args[0][0][5:]), gltfpack.QUANTIZE_ARGS)
+        with open(self.dst, "rb") as f:
+            self.assertEqual(f.read(), b"packed")
+
+    @patch.object(gltfpack, "GLTFPACK_BIN", "/usr/bin/gltfpack")
+    def test_failure_returns_false(self):
+        """gltfpack が失敗した場合はFalseを返すことを検証する。"""
+        error = subprocess.CalledProcessError(1, "gltfpack")
+        with patch.object(gltfpack.subprocess, "run", side_effect=error):
+            self.assertFalse(gltfpack.pack_glb(self.src, self.dst, gltfpack.QUANTIZE_ARGS))
+        self.assertEqual(os.listdir(self.temp_dir), ["in.glb"])
+
+
+class TestQuantizeArgs(unittest.TestCase):
+    """GLB出力の量子化オプションがアニメーションを保持する設定になっていることを確認するテスト。"""
+
+    def test_animation_and_nodes_are_kept(self):
+        """再サンプリングの無効化・定数トラックとノードの保持・最高精度のキーフレーム量子化を指定することを検証する。"""
+        self.assertEqual(
+            gltfpack.QUANTIZE_ARGS,
+            ("-kn", "-km", "-af", "0", "-ac", "-at", "24", "-ar", "16", "-as", "24"),
+        )
+        self.assertNotIn("-cc", gltfpack.QUANTIZE_ARGS)
+        self.assertNotIn("-c", gltfpack.QUANTIZE_ARGS)
+
+
+if __name__ == "__main__":
+    unittest.main()
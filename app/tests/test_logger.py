@@ -4,6 +4,8 @@ import logging
 from importlib import reload
 from unittest.mock import patch
 
+import structlog
+
 from app.utils import logger as logger_module
 
 class TestAppLogger(unittest.TestCase):
@@ -12,6 +14,7 @@ class TestAppLogger(unittest.TestCase):
     def tearDown(self):
         # reset configuration after each test
         logger_module.AppLogger._configured = False
+        logger_module.AppLogger._stop_listener()
 
     @patch.dict(os.environ, {"LOG_LEVEL": "DEBUG", "APP_ENV": "local"})
     def test_log_level_env(self):
@@ -19,6 +22,111 @@ class TestAppLogger(unittest.TestCase):
         logger_module.AppLogger._configured = False
         logger = logger_module.AppLogger.get_logger('test')
         self.assertEqual(logger.getEffectiveLevel(), logging.DEBUG)
+    @patch.dict(os.environ, {"LOG_LEVEL": "INFO"})
+    def test_root_logs_through_queue(self):
+        """ルートロガーがキュー経由で書き込み、停止時に残りのレコードが出力されることを検証する。"""
+        from logging.handlers import QueueHandler
+        logger_module.AppLogger._configured = False
+        logger_module.AppLogger.configure()
+        root = logging.getLogger()
+        self.assertEqual(len(root.handlers), 1)
+        self.assertIsInstance(root.handlers[0], QueueHandler)
+
+        records = []
+        sink = logging.Handler()
+        sink.emit = records.append
+        logger_module.AppLogger._listener.handlers += (sink,)
+        logging.getLogger("queued").info("hello %s", "world")
+        logger_module.AppLogger._stop_listener()
+        self.assertEqual([r.getMessage() for r in records], ["hello world"])
+
+    @patch.dict(os.environ, {"LOG_LEVEL": "INFO"})
+    def test_arguments_are_formatted_when_logged(self):
+        """ログ呼び出し後に引数を変更しても、呼び出し時点の値が出力されることを検証する。"""
+        logger_module.AppLogger._configured = False
+        logger_module.AppLogger.configure()
+        listener = logger_module.AppLogger._listener
+        listener.stop()
+
+        messages = []
+        sink = logging.Handler()
+        sink.emit = lambda record: messages.append(record.getMessage())
+        listener.handlers += (sink,)
+        items = ["a"]
+        logging.getLogger("queued").info("items %s", items)
+        items.append("b")
+        listener.start()
+        logger_module.AppLogger._stop_listener()
+        self.assertEqual(messages, ["items ['a']"])
+
+    @patch.dict(os.environ, {"LOG_LEVEL": "INFO"})
+    def test_concurrent_configure_installs_one_listener(self):
+        """複数スレッドから同時に設定しても、キューハンドラとリスナーが1つだけになることを検証する。"""
+        from concurrent.futures import ThreadPoolExecutor
+        from logging.handlers import QueueListener
+        logger_module.AppLogger._configured = False
+        with patch.object(logger_module, "QueueListener", wraps=QueueListener) as listener_cls, \
+                ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: logger_module.AppLogger.configure(), range(8)))
+
+        listener_cls.assert_called_once()
+        self.assertEqual(len(logging.getLogger().handlers), 1)
+
+    @patch.dict(os.environ, {"LOG_LEVEL": "INFO", "LOG_FORMAT": "json"})
+    def test_json_records_render_with_and_without_orjson(self):
+        """orjson の有無に関わらず、JSON形式のレコードが同じ内容にデコードできることを検証する。"""
+        import json
+        record = logging.LogRecord("json", logging.INFO, __file__, 1, 'say "%s"', ("hi",), None)
+        for fallback in (False, True):
+            with self.subTest(stdlib_json=fallback):
+                with patch.object(logger_module, "orjson", None if fallback else logger_module.orjson):
+                    logger_module.AppLogger._configured = False
+                    logger_module.AppLogger.configure()
+                formatter = logger_module.AppLogger._listener.handlers[0].formatter
+                rendered = json.loads(formatter.format(record))
+                self.assertEqual(rendered["event"], 'say "hi"')
+                self.assertEqual(rendered["level"], "info")
+
+    @patch.dict(os.environ, {"LOG_LEVEL": "INFO", "LOG_FORMAT": "json"})
+    def test_structlog_records_keep_traceback_and_stack(self):
+        """structlog のロガーで出力した例外とスタック情報がJSONに残ることを検証する。"""
+        logger_module.AppLogger._configured = False
+        logger = logger_module.AppLogger.get_logger("native")
+        self.assertIsInstance(logger, structlog.BoundLoggerBase)
+        self.assertFalse(logger.isEnabledFor(logging.DEBUG))
+        listener = logger_module.AppLogger._listener
+        lines = []
+        sink = logging.Handler()
+        sink.setFormatter(listener.handlers[0].formatter)
+        sink.emit = lambda record: lines.append(sink.format(record))
+        listener.handlers += (sink,)
+
+        try:
+            raise ZeroDivisionError("boom")
+        except ZeroDivisionError:
+            logger.exception("failed %s", "once")
+        logger.info("where", stack_info=True)
+        logger.debug("below LOG_LEVEL")
+        logger_module.AppLogger._stop_listener()
+
+        self.assertEqual(len(lines), 2)
+        self.assertIn("failed once", lines[0])
+        self.assertIn("ZeroDivisionError", lines[0])
+        self.assertIn("Stack (most recent call last)", lines[1])
+
+    def test_timestamp_is_utc_iso_with_microseconds(self):
+        """JSON用のタイムスタンプが UTC の ISO 8601（マイクロ秒、末尾 Z）になることを検証する。"""
+        with patch.object(logger_module.time, "time_ns", return_value=1_700_000_000_123_456_789):
+            event = logger_module._add_timestamp(None, "info", {})
+        self.assertEqual(event["timestamp"], "2023-11-14T22:13:20.123456Z")
+
+    def test_stdlib_records_are_stamped_with_their_creation_time(self):
+        """標準 logging のレコードは、整形時刻ではなくログ呼び出し時刻で記録されることを検証する。"""
+        record = logging.LogRecord("x", logging.INFO, __file__, 1, "msg", None, None)
+        record.created = 1_700_000_000.25
+        with patch.object(logger_module.time, "time_ns", return_value=1_800_000_000_000_000_000):
+            event = logger_module._add_timestamp(None, "info", {"_record": record})
+        self.assertEqual(event["timestamp"], "2023-11-14T22:13:20.250000Z")
 
 if __name__ == '__main__':
     unittest.main()
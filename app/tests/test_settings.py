@@ -32,12 +32,17 @@ class TestSettings(TestCase):
             settings = settings_module.get_settings()
 
             self.assertEqual(settings.max_file_size, 50 * 1024 * 1024)
+            self.assertEqual(settings.redis_max_connections, 32)
             self.assertEqual(settings.rate_limit_requests, 10)
             self.assertEqual(settings.rate_limit_window, 60)
             self.assertEqual(settings.conversion_timeout, 300)
             self.assertEqual(settings.cache_duration, 3600)
             self.assertEqual(settings.log_level, "INFO")
             self.assertEqual(settings.log_format, "plain")
+            self.assertEqual(settings.blender_system_scripts, "/usr/local/blender/4.3/scripts")
+            self.assertTrue(settings.gltf_quantize)
+            self.assertEqual(settings.conversion_workers, 0)
+            self.assertIsNone(settings.conversion_temp_dir)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,58 @@
+"""gltfpack によるGLBの後処理。gltfpack が無い環境では何もしない。"""
+import os
+import shutil
+import subprocess
+from typing import Optional, Sequence
+
+from app.utils.logger import AppLogger
+
+logger = AppLogger.get_logger(__name__)
+
+# 頂点属性へ KHR_mesh_quantization を適用する。gltfpack の既定ではアニメーションも30Hzへ再サンプリング・
+# 低精度量子化され、変化のないトラックや名前のないノードは削除・統合されるため、それらを抑止する
+QUANTIZE_ARGS = (
+    "-kn",  # keep named nodes (every node Blender exports is named) and their meshes
+    "-km",  # keep named materials unmerged
+    "-af", "0",  # keep the original keyframes instead of resampling
+    "-ac",  # keep constant animation tracks
+    # Keyframes are still quantized, at the highest precision gltfpack allows
+    "-at", "24",
+    "-ar", "16",
+    "-as", "24",
+)
+
+# プロセス起動時に1回だけ解決する（未インストールならNone）
+GLTFPACK_BIN: Optional[str] = shutil.which("gltfpack")
+
+
+def pack_glb(src_path: str, dst_path: str, args: Sequence[str]) -> bool:
+    """
+    gltfpack で src_path を処理し、結果を dst_path へ書き出す。
+
+    Args:
+        src_path: 入力GLBのパス。
+        dst_path: 出力先のパス。src_path と同じでもよい。
+        args: gltfpack に渡す追加オプション。
+
+    Returns:
+        bool: 処理済みファイルを書き出した場合はTrue。gltfpack が無い、または失敗した場合はFalse。
+    """
+    if GLTFPACK_BIN is None:
+        return False
+
+    # gltfpack decides the container from the extension, so write a .glb and rename
+    packed_path = dst_path + ".packed.glb"
+    try:
+        subprocess.run(
+            [GLTFPACK_BIN, "-i", src_path, "-o", packed_path, *args],
+            check=True,
+            capture_output=True,
+        )
+    except (OSError, subprocess.CalledProcessError) as exc:
+        logger.warning(f"gltfpack failed, keeping unprocessed output: {exc}")
+        if os.path.exists(packed_path):
+            os.remove(packed_path)
+        return False
+
+    os.replace(packed_path, dst_path)
+    return True
@@ -1,122 +1,215 @@
+from __future__ import annotations
+
+import atexit
 import os
 import logging
-import logging.config
-import structlog
-from typing import Union
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import TYPE_CHECKING, Any, Callable, List, Optional
+
+if TYPE_CHECKING:
+    import structlog
+
+try:
+    import orjson
+except ImportError:
+    # Optional: JSON logs are rendered with the stdlib json module when orjson is not installed
+    orjson = None
+
+
+def _orjson_dumps(obj: Any, default: Optional[Callable[[Any], Any]] = None, **_: Any) -> str:
+    """structlog の JSONRenderer 用シリアライザ。orjson で1行のJSON文字列にする。"""
+    return orjson.dumps(obj, default=default).decode()
+
+
+# Each rollover renames and reopens the file on the listener thread; keep them rare
+LOG_FILE_MAX_BYTES = 128 * 1024 * 1024
+
+
+# (whole seconds since the epoch, "YYYY-MM-DDTHH:MM:SS" for them); records within a second share it
+_timestamp_prefix = (-1, "")
+
+
+def _add_timestamp(logger: Any, method_name: str, event_dict: dict) -> dict:
+    """UTC の ISO 8601 タイムスタンプ（マイクロ秒、末尾 Z）を event_dict["timestamp"] に追加する processor。
+
+    標準 logging のレコード（foreign_pre_chain 経由）は、整形時刻ではなくログ呼び出し時刻（record.created）を使う。
+    """
+    global _timestamp_prefix
+    record = event_dict.get("_record")
+    if record is not None:
+        # Formatted later on the listener thread; the record already holds when it was logged
+        micros_since_epoch = round(record.created * 1_000_000)
+    else:
+        micros_since_epoch = time.time_ns() // 1000
+    seconds, micros = divmod(micros_since_epoch, 1_000_000)
+    cached_seconds, prefix = _timestamp_prefix
+    if seconds != cached_seconds:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds))
+        _timestamp_prefix = (seconds, prefix)
+    event_dict["timestamp"] = f"{prefix}.{micros:06d}Z"
+    return event_dict
+
+
+def _filtering_bound_logger(structlog: Any, min_level: int) -> type:
+    """min_level 未満を呼び出し時点で捨てる structlog のラッパークラスを返す。
+
+    標準 logging と同じ isEnabledFor / getEffectiveLevel も使えるようにしておく。
+    """
+
+    class FilteringBoundLogger(structlog.make_filtering_bound_logger(min_level)):
+        def isEnabledFor(self, level: int) -> bool:
+            return self.is_enabled_for(level)
+
+        def getEffectiveLevel(self) -> int:
+            return self.get_effective_level()
+
+    return FilteringBoundLogger
+
+
+class _RecordQueueHandler(QueueHandler):
+    """レコードを pickle 用に整形せずにキューへ積む QueueHandler。
+
+    キューは同一プロセス内でリスナーへ渡すだけなので、レコードのコピーや例外情報の文字列化は不要。
+    %-形式の引数だけは呼び出し時点でメッセージへ埋め込み、後から変更された可変オブジェクトの値が出ないようにする。
+    structlog のイベント辞書（引数なし）はフォーマッタまで辞書のまま届く。
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
 
 
 class AppLogger:
     """Application-wide logger configuration"""
 
     _configured = False
+    # Drains the root logger's queue into the real handlers on a background thread
+    _listener: Optional[QueueListener] = None
+    # LOG_FORMAT=json as read by the last configure(); get_logger hands out structlog loggers then
+    _json_output = False
+    # Imported by the first JSON-mode configure(); plain mode never loads structlog's module graph
+    _structlog: Any = None
+    # Modules importing AppLogger from different threads must not configure (and start a listener) twice
+    _configure_lock = threading.Lock()
 
     @classmethod
     def configure(cls):
         if cls._configured:
             return
+        with cls._configure_lock:
+            if not cls._configured:
+                cls._configure()
+
+    @classmethod
+    def _configure(cls):
+        """環境変数からハンドラを組み立ててキュー経由で開始する。configure のロック内で呼ぶ。"""
+        cls._stop_listener()
 
         logging.getLogger(__name__).debug("Configuring application logger")
 
         log_level = os.getenv("LOG_LEVEL", "INFO").upper()
         log_format = os.getenv("LOG_FORMAT", "plain").lower()
         log_file = os.getenv("LOG_FILE")
+        cls._json_output = log_format == "json"
 
-        handler_names = ["console"]
-        if log_file:
-            handler_names.append("file")
+        root = logging.getLogger()
+        root.setLevel(log_level)
 
         if log_format == "json":
+            import structlog
+
+            cls._structlog = structlog
+            # Added once per record: by structlog's chain for its own loggers, by the formatter for stdlib ones
+            shared_processors = [
+                structlog.stdlib.add_logger_name,
+                structlog.stdlib.add_log_level,
+                _add_timestamp,
+            ]
             # Configure structlog for JSON output
             structlog.configure(
                 processors=[
-                    structlog.stdlib.filter_by_level,
-                    structlog.stdlib.add_logger_name,
-                    structlog.stdlib.add_log_level,
-                    structlog.stdlib.PositionalArgumentsFormatter(),
-                    structlog.processors.TimeStamper(fmt="iso"),
+                    *shared_processors,
                     structlog.processors.StackInfoRenderer(),
                     structlog.processors.format_exc_info,
-                    structlog.stdlib.render_to_log_kwargs,
+                    # The event dict reaches the formatter as-is, skipping its foreign_pre_chain
+                    structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
                 ],
                 context_class=dict,
                 logger_factory=structlog.stdlib.LoggerFactory(),
-                wrapper_class=structlog.stdlib.BoundLogger,
+                # Levels below LOG_LEVEL return before any processor runs; positional args are %-formatted there too
+                wrapper_class=_filtering_bound_logger(structlog, root.level),
                 cache_logger_on_first_use=True,
             )
 
-            # Configure standard logging to use structlog's formatter
-            log_config = {
-                "version": 1,
-                "disable_existing_loggers": False,
-                "formatters": {
-                    "json": {
-                        "()": structlog.stdlib.ProcessorFormatter,
-                        "processor": structlog.processors.JSONRenderer(),
-                        "foreign_pre_chain": [
-                            structlog.stdlib.add_logger_name,
-                            structlog.stdlib.add_log_level,
-                            structlog.processors.TimeStamper(fmt="iso"),
-                        ],
-                    },
-                },
-                "handlers": {
-                    "console": {
-                        "class": "logging.StreamHandler",
-                        "formatter": "json",
-                    },
-                },
-                "root": {
-                    "handlers": handler_names,
-                    "level": log_level,
-                },
-            }
-            if log_file:
-                log_config["handlers"]["file"] = {
-                    "class": "logging.handlers.RotatingFileHandler",
-                    "formatter": "json",
-                    "filename": log_file,
-                    "maxBytes": 10 * 1024 * 1024,
-                    "backupCount": 5,
-                }
-            logging.config.dictConfig(log_config)
+            # Standard logging records are rendered by structlog's formatter
+            renderer = (
+                structlog.processors.JSONRenderer(serializer=_orjson_dumps)
+                if orjson is not None
+                else structlog.processors.JSONRenderer()
+            )
+            formatter = structlog.stdlib.ProcessorFormatter(
+                processor=renderer,
+                foreign_pre_chain=shared_processors,
+            )
         else:
             # Plain text format configuration
-            fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-            log_config = {
-                "version": 1,
-                "disable_existing_loggers": False,
-                "formatters": {"default": {"format": fmt}},
-                "handlers": {
-                    "console": {
-                        "class": "logging.StreamHandler",
-                        "formatter": "default",
-                    }
-                },
-                "root": {"level": log_level, "handlers": handler_names},
-            }
-            if log_file:
-                log_config["handlers"]["file"] = {
-                    "class": "logging.handlers.RotatingFileHandler",
-                    "formatter": "default",
-                    "filename": log_file,
-                    "maxBytes": 10 * 1024 * 1024,
-                    "backupCount": 5,
-                }
-            logging.config.dictConfig(log_config)
+            formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+        # Built directly rather than through dictConfig; the listener owns them from here on
+        handlers = [logging.StreamHandler()]
+        if log_file:
+            # open() already applies O_APPEND (mode "a") and O_CLOEXEC; delay defers it to the first record
+            handlers.append(
+                RotatingFileHandler(log_file, maxBytes=LOG_FILE_MAX_BYTES, backupCount=5, delay=True)
+            )
+        for handler in handlers:
+            handler.setFormatter(formatter)
 
+        cls._start_listener(handlers)
         cls._configured = True
         logging.getLogger(__name__).debug("Logger configured")
 
     @classmethod
-    def get_logger(cls, name: str = None) -> Union[logging.Logger, structlog.stdlib.BoundLogger]:
+    def _start_listener(cls, handlers: List[logging.Handler]):
+        """ルートロガーのハンドラをキュー1つに差し替え、handlers への書き込みをバックグラウンドスレッドへ移す。"""
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+
+        log_queue = queue.SimpleQueue()
+        root.addHandler(_RecordQueueHandler(log_queue))
+        cls._listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        cls._listener.start()
+
+    @classmethod
+    def _stop_listener(cls):
+        """キューに残ったレコードを書き出してからリスナーを停止する。"""
+        if cls._listener is not None:
+            cls._listener.stop()
+            for handler in cls._listener.handlers:
+                handler.close()
+            cls._listener = None
+
+    @classmethod
+    def get_logger(cls, name: str = None) -> logging.Logger | structlog.typing.FilteringBoundLogger:
+        """name のロガーを返す。呼び出し側はモジュール単位で1回取得し、同じインスタンスを使い回すこと。"""
         if not cls._configured:
             cls.configure()
 
-        log_format = os.getenv("LOG_FORMAT", "plain").lower()
-        if log_format == "json":
-            logger = structlog.get_logger(name)
+        if cls._json_output:
+            # bind() resolves the lazy proxy now, so the first log call on a request path doesn't
+            logger = cls._structlog.get_logger(name).bind()
         else:
             logger = logging.getLogger(name)
 
-        logger.debug(f"Logger retrieved for {name}")
+        logger.debug("Logger retrieved for %s", name)
         return logger
+
+
+# Flush queued records before the interpreter tears down the handlers
+atexit.register(AppLogger._stop_listener)